@@ -0,0 +1,84 @@
+import queue
+import threading
+import tkinter as tk
+
+class AnswerWorker:
+    # Scores and persists answers on a background thread. Results are handed
+    # back to the Tk thread by polling with root.after, since Tk widgets must
+    # only be touched from the thread running mainloop.
+    def __init__(self, root, score_fn, persist_fn, poll_ms=50):
+        self.root = root
+        self.score_fn = score_fn
+        self.persist_fn = persist_fn
+        self.poll_ms = poll_ms
+        self.pending = 0
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._idle_callbacks = []
+        self._thread = threading.Thread(target=self._run, name="answer-worker", daemon=True)
+        self._thread.start()
+        self.root.after(self.poll_ms, self._poll)
+
+    def submit(self, job, on_done):
+        self.pending += 1
+        self._jobs.put((job, on_done))
+
+    def when_idle(self, callback):
+        # Runs callback on the Tk thread once every submitted job has been scored and saved
+        if self.pending == 0:
+            callback()
+        else:
+            self._idle_callbacks.append(callback)
+
+    def stop(self):
+        self._jobs.put(None)
+
+    def _take_batch(self):
+        first = self._jobs.get()
+        if first is None:
+            return None
+        batch = [first]
+        while True:
+            try:
+                item = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                self._jobs.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch is None:
+                return
+            jobs = [job for job, _ in batch]
+            try:
+                results = [self.score_fn(job) for job in jobs]
+                # Everything that queued up while we were busy goes in one transaction
+                self.persist_fn(list(zip(jobs, results)))
+            except Exception as e:
+                for _, on_done in batch:
+                    self._results.put((on_done, None, e))
+                continue
+            for (_, on_done), result in zip(batch, results):
+                self._results.put((on_done, result, None))
+
+    def _poll(self):
+        while True:
+            try:
+                on_done, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            on_done(result, error)
+        if self.pending == 0 and self._idle_callbacks:
+            callbacks, self._idle_callbacks = self._idle_callbacks, []
+            for callback in callbacks:
+                callback()
+        try:
+            self.root.after(self.poll_ms, self._poll)
+        except tk.TclError:
+            self.stop()  # root window was destroyed
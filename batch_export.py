@@ -0,0 +1,87 @@
+import argparse
+import os
+import re
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+# Writes one PDF report per user, e.g. the weekly clinician export:
+#   python batch_export.py --out-dir reports/2024-W10 --days 7 --workers 4
+# matplotlib and FPDF are CPU-bound and not thread-safe, so users are spread
+# over processes. Each worker keeps its own database connection (db.connect_db
+# is per thread) for every report it renders.
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use("Agg")
+
+def _export_one(user_id, username, path, since, max_rows):
+    from report_generator import generate_pdf_report
+    try:
+        result = generate_pdf_report(user_id, username, filename=path, since=since, max_rows=max_rows)
+        return user_id, username, result, None
+    except Exception:
+        return user_id, username, None, traceback.format_exc()
+
+def report_path(out_dir, user_id, username):
+    safe = re.sub(r"[^A-Za-z0-9_.-]+", "_", username or "user").strip("._") or "user"
+    return os.path.join(out_dir, f"{safe}_{user_id}.pdf")
+
+def export_all(out_dir, workers=None, since=None, max_rows=None, user_ids=None, progress=None):
+    # Returns {"written": [...], "skipped": [...], "failed": [(user_id, username, error)]}
+    from db import create_tables, query
+    create_tables()
+    os.makedirs(out_dir, exist_ok=True)
+    users = query("SELECT id, username FROM users ORDER BY id")
+    if user_ids:
+        wanted = set(user_ids)
+        users = [u for u in users if u[0] in wanted]
+
+    summary = {"written": [], "skipped": [], "failed": []}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = {pool.submit(_export_one, uid, name, report_path(out_dir, uid, name), since, max_rows): (uid, name)
+                   for uid, name in users}
+        for done, future in enumerate(as_completed(futures), 1):
+            uid, name = futures[future]
+            try:
+                _, _, path, error = future.result()
+            except Exception as e:  # worker process died
+                path, error = None, repr(e)
+            if error:
+                summary["failed"].append((uid, name, error))
+            elif path:
+                summary["written"].append(path)
+            else:
+                summary["skipped"].append(uid)  # no responses in range
+            if progress:
+                progress(done, len(futures), summary)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a PDF report for every user.")
+    parser.add_argument("--out-dir", default="reports")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--days", type=int, help="only include the last N days (7 for a weekly report)")
+    parser.add_argument("--max-rows", type=int, help="cap each report at the most recent N answers")
+    parser.add_argument("--user", type=int, action="append", dest="user_ids", help="limit to these user ids")
+    args = parser.parse_args(argv)
+
+    since = datetime.now() - timedelta(days=args.days) if args.days else None
+    started = time.monotonic()
+
+    def progress(done, total, summary):
+        print(f"[{done}/{total}] {len(summary['written'])} written, {len(summary['skipped'])} skipped, "
+              f"{len(summary['failed'])} failed", file=sys.stderr)
+
+    summary = export_all(args.out_dir, workers=args.workers, since=since, max_rows=args.max_rows,
+                         user_ids=args.user_ids, progress=progress)
+    for uid, name, error in summary["failed"]:
+        print(f"\nFailed: user {uid} ({name})\n{error}", file=sys.stderr)
+    print(f"Exported {len(summary['written'])} reports to {args.out_dir} in {time.monotonic() - started:.1f}s",
+          file=sys.stderr)
+    return 1 if summary["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import db
+from synthetic_data import populate, synthetic_answer
+
+# Times the hot paths against a synthetic database and prints JSON, e.g.
+#   python benchmark.py --users 50 --responses 20000 --output bench.json
+# Compare two runs with: python benchmark.py --compare old.json new.json
+
+BENCHMARKS = []
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS.append((name, fn))
+        return fn
+    return register
+
+def measure(fn, repeat, warmup=1):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "runs": repeat,
+        "mean_s": statistics.fmean(samples),
+        "p50_s": samples[len(samples) // 2],
+        "p95_s": samples[min(len(samples) - 1, int(len(samples) * 0.95))],
+        "min_s": samples[0],
+    }
+
+def _texts(n):
+    rng = random.Random(1)
+    return [synthetic_answer(rng, rng.choice(["POSITIVE", "NEGATIVE", "NEUTRAL"])) for _ in range(n)]
+
+@benchmark("analyze_sentiment.single")
+def bench_sentiment_single(ctx):
+    from scorers import get_scorer
+    scorer = get_scorer(ctx.model_scorer)
+    scorer.model.get()
+    texts = _texts(10)
+    # One forward pass per answer, as end_questionnaire did; the cache is bypassed
+    result = measure(lambda: [scorer.score_uncached([t], batch_size=1) for t in texts], ctx.repeat)
+    result["items_per_run"] = len(texts)
+    return result
+
+@benchmark("analyze_sentiment.batched")
+def bench_sentiment_batched(ctx):
+    from scorers import get_scorer
+    scorer = get_scorer(ctx.model_scorer)
+    scorer.model.get()
+    texts = _texts(10)
+    result = measure(lambda: scorer.score_uncached(texts, batch_size=len(texts)), ctx.repeat)
+    result["items_per_run"] = len(texts)
+    return result
+
+def _mixed_length_texts(n):
+    # Mostly short answers plus some long free-text ones, a few past the 512-token window
+    rng = random.Random(4)
+    texts = []
+    for i in range(n):
+        label = rng.choice(["POSITIVE", "NEGATIVE", "NEUTRAL"])
+        if i % 8 == 0:
+            texts.append(" ".join(synthetic_answer(rng, label, long=True) for _ in range(4)))
+        else:
+            texts.append(synthetic_answer(rng, label, long=i % 4 == 0))
+    return texts
+
+def _token_rates(result, real, padded):
+    # real = non-padding tokens the model saw per run
+    result["tokens_per_run"] = real
+    result["tokens_per_s"] = real / result["p50_s"]
+    result["padding_fraction"] = 1 - real / padded
+    return result
+
+@benchmark("tokens.arrival_order")
+def bench_tokens_arrival_order(ctx):
+    # The old path: batches of 16 in arrival order, padded to the longest, truncated at 512
+    import torch
+    from scorers import get_scorer
+    pipe = get_scorer("distilbert").model.get()
+    texts = _mixed_length_texts(64)
+    counts = {}
+    def run():
+        real = padded = 0
+        with torch.inference_mode():
+            for start in range(0, len(texts), 16):
+                encoded = pipe.tokenizer(texts[start:start + 16], padding=True, truncation=True, return_tensors="pt")
+                pipe.model(**encoded)
+                real += int(encoded["attention_mask"].sum())
+                padded += encoded["attention_mask"].numel()
+        counts.update(real=real, padded=padded)
+    result = measure(run, ctx.repeat)
+    return _token_rates(result, counts["real"], counts["padded"])
+
+@benchmark("tokens.length_bucketed")
+def bench_tokens_length_bucketed(ctx):
+    # chunking.score_windows: every token scored, batches grouped by length
+    import torch
+    from chunking import score_windows
+    from metrics import counter
+    from scorers import get_scorer
+    pipe = get_scorer("distilbert").model.get()
+    texts = _mixed_length_texts(64)
+    forward = lambda encoded: torch.softmax(pipe.model(**encoded).logits, dim=-1)
+    real, padded = counter("tokens.real"), counter("tokens.padded")
+    counts = {}
+    def run():
+        before = real.value, padded.value
+        score_windows(pipe.tokenizer, forward, texts, batch_size=16)
+        counts.update(real=real.value - before[0], padded=padded.value - before[1])
+    result = measure(run, ctx.repeat)
+    return _token_rates(result, counts["real"], counts["padded"])
+
+@benchmark("handle_response.textblob")
+def bench_textblob(ctx):
+    from scorers import get_scorer, response_fields
+    scorer = get_scorer("textblob")
+    texts = _texts(100)
+    result = measure(lambda: [response_fields(scorer.score_uncached([t])[0]) for t in texts], ctx.repeat)
+    result["items_per_run"] = len(texts)
+    return result
+
+@benchmark("handle_response.lexicon")
+def bench_lexicon(ctx):
+    from scorers import get_scorer, response_fields
+    scorer = get_scorer("lexicon")
+    texts = _texts(100)
+    result = measure(lambda: [response_fields(scorer.score_uncached([t])[0]) for t in texts], ctx.repeat)
+    result["items_per_run"] = len(texts)
+    return result
+
+@benchmark("score_batch.lexicon")
+def bench_lexicon_batched(ctx):
+    from scorers import get_scorer
+    scorer = get_scorer("lexicon")
+    texts = _texts(1000)
+    result = measure(lambda: scorer.score_uncached(texts), ctx.repeat)
+    result["items_per_run"] = len(texts)
+    return result
+
+@benchmark("db.insert_response")
+def bench_insert(ctx):
+    # One transaction per answer, as a check-in without write-behind would do
+    rng = random.Random(2)
+    now = datetime.now().isoformat()
+    def run():
+        for _ in range(50):
+            with db.transaction() as conn:
+                db.insert_responses(conn, [(ctx.user_id, "Q", synthetic_answer(rng, "NEUTRAL"),
+                                            "NEUTRAL", "Neutral", 0.0, now)], model_version="benchmark")
+    result = measure(run, ctx.repeat)
+    result["items_per_run"] = 50
+    return result
+
+@benchmark("db.insert_response.batched")
+def bench_insert_batched(ctx):
+    rng = random.Random(3)
+    now = datetime.now().isoformat()
+    rows = [(ctx.user_id, "Q", synthetic_answer(rng, "NEUTRAL"), "NEUTRAL", "Neutral", 0.0, now) for _ in range(50)]
+    def run():
+        with db.transaction() as conn:
+            db.insert_responses(conn, rows, model_version="benchmark")
+    result = measure(run, ctx.repeat)
+    result["items_per_run"] = len(rows)
+    return result
+
+@benchmark("graph_viewer.daily_average")
+def bench_graph_query(ctx):
+    from rollups import daily_average
+    return measure(lambda: daily_average(ctx.user_id, "POSITIVE"), ctx.repeat)
+
+@benchmark("graph_viewer.daily_average.scan")
+def bench_graph_query_scan(ctx):
+    # The aggregate the rollup replaces, for comparison
+    sql = """
+        SELECT DATE(created_at, 'unixepoch', 'localtime') as date, AVG(confidence)
+        FROM responses WHERE user_id = ? AND sentiment = 'POSITIVE'
+        GROUP BY date ORDER BY date
+    """
+    return measure(lambda: db.query(sql, (ctx.user_id,)), ctx.repeat)
+
+@benchmark("main.get_last_checkin_date")
+def bench_last_checkin(ctx):
+    from rollups import last_checkin
+    return measure(lambda: last_checkin(ctx.user_id), ctx.repeat)
+
+@benchmark("report_generator.generate_pdf_report")
+def bench_report(ctx):
+    import matplotlib
+    matplotlib.use("Agg")
+    from report_generator import generate_pdf_report
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+    try:
+        result = measure(lambda: generate_pdf_report(ctx.user_id, "benchmark", filename=path), max(1, ctx.repeat // 5))
+    finally:
+        os.remove(path)
+    result["rows"] = db.query_one("SELECT COUNT(*) FROM responses WHERE user_id = ?", (ctx.user_id,))[0]
+    return result
+
+class Context:
+    def __init__(self, args, user_id):
+        self.repeat = args.repeat
+        self.model_scorer = args.model_scorer
+        self.user_id = user_id
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run(args):
+    db.DB_NAME = args.db
+    if args.fresh and os.path.exists(args.db):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    db.create_tables()
+    existing = db.query_one("SELECT COUNT(*) FROM responses")[0]
+    if existing < args.responses:
+        populate(args.users, args.responses - existing, seed=args.seed)
+    # Benchmark the busiest synthetic user
+    user_id = db.query_one("SELECT user_id FROM user_summary ORDER BY total DESC LIMIT 1")[0]
+    ctx = Context(args, user_id)
+
+    results = {}
+    for name, fn in BENCHMARKS:
+        if args.only and not any(name.startswith(prefix) for prefix in args.only):
+            continue
+        try:
+            results[name] = fn(ctx)
+        except ImportError as e:
+            results[name] = {"skipped": f"missing dependency: {e.name or e}"}
+        print(f"{name}: {results[name]}", file=sys.stderr)
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "time": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "db": args.db,
+            "responses": db.query_one("SELECT COUNT(*) FROM responses")[0],
+            "users": db.query_one("SELECT COUNT(*) FROM users")[0],
+            "model_scorer": args.model_scorer,
+        },
+        "results": results,
+    }
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)["results"]
+    with open(new_path) as f:
+        new = json.load(f)["results"]
+    for name in sorted(set(old) & set(new)):
+        if "p50_s" in old[name] and "p50_s" in new[name]:
+            ratio = new[name]["p50_s"] / old[name]["p50_s"] if old[name]["p50_s"] else float("inf")
+            print(f"{name:45s} {old[name]['p50_s'] * 1000:10.3f}ms -> {new[name]['p50_s'] * 1000:10.3f}ms  x{ratio:.2f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark scoring, storage and reporting hot paths.")
+    parser.add_argument("--db", default="benchmark.db", help="database to populate and query")
+    parser.add_argument("--fresh", action="store_true", help="delete the database first")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--responses", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--model-scorer", default="distilbert", help="scorer used for the analyze_sentiment cases")
+    parser.add_argument("--only", action="append", help="run benchmarks whose name starts with this prefix")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files and exit")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = run(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+# Headless bulk scoring of exported answers, e.g.
+#   python bulk_score.py answers.jsonl --output scored.jsonl --workers 8
+#   python bulk_score.py answers.csv --to-db --scorer distilbert-int8
+# Rerunning the same command after a crash resumes from the last checkpoint.
+
+_worker_scorer = None
+_worker_cached = True
+
+def _init_worker(scorer_name, use_cache):
+    global _worker_scorer, _worker_cached
+    from scorers import get_scorer
+    _worker_scorer = get_scorer(scorer_name)
+    _worker_cached = use_cache
+
+def _score_chunk(texts, batch_size):
+    from scorers import response_fields
+    if _worker_cached:
+        results = _worker_scorer.score_batch(texts, batch_size=batch_size)
+    else:
+        results = _worker_scorer.score_uncached(texts, batch_size=batch_size)
+    return [{**response_fields(r), "label": r["label"], "score": r["score"]} for r in results]
+
+class InvalidRecord:
+    # Stands in for an input line that isn't a JSON object, so it still counts
+    # towards the checkpoint and a resumed job skips past it
+    def __init__(self, problem):
+        self.problem = problem
+
+def read_records(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield InvalidRecord(f"malformed JSON ({e})")
+                    continue
+                yield record if isinstance(record, dict) else InvalidRecord(f"not a JSON object: {line.strip()[:40]}")
+
+def skip_line(line, problem):
+    print(f"Skipping line {line}: {problem}", file=sys.stderr)
+
+def chunked(records, size):
+    while True:
+        chunk = list(islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+class FileSink:
+    # JSONL output plus a sidecar checkpoint holding the line count and the
+    # output size at that point; anything written after it is truncated on resume.
+    # Invalid lines are left out of the output and counted in the checkpoint.
+    def __init__(self, path, checkpoint_path):
+        self.path = path
+        self.checkpoint_path = checkpoint_path
+        self.lines_done, self.lines_skipped, size = 0, 0, 0
+        if os.path.exists(checkpoint_path):
+            with open(checkpoint_path, encoding="utf-8") as f:
+                state = json.load(f)
+            self.lines_done, size = state["lines_done"], state["output_bytes"]
+            self.lines_skipped = state.get("lines_skipped", 0)
+        self.file = open(path, "ab")
+        self.file.truncate(size)
+        self.file.seek(size)
+
+    def write(self, records, texts, scored):
+        for i, (record, fields) in enumerate(zip(records, scored)):
+            if isinstance(record, InvalidRecord):
+                self.lines_skipped += 1
+                skip_line(self.lines_done + i + 1, record.problem)
+                continue
+            self.file.write((json.dumps({**record, **fields}, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.lines_done += len(records)
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"lines_done": self.lines_done, "output_bytes": self.file.tell(),
+                       "lines_skipped": self.lines_skipped}, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def close(self):
+        self.file.close()
+
+class DbSink:
+    # Inserts into responses; the checkpoint row is committed with the rows.
+    # Records that can't be inserted are skipped, logged with their line number
+    # and counted in the checkpoint, so one bad line can't stall a resumed job.
+    def __init__(self, job, model_version, user_field, question_field, timestamp_field):
+        from db import create_tables, query_one
+        create_tables()
+        self.job = job
+        self.model_version = model_version
+        self.user_field = user_field
+        self.question_field = question_field
+        self.timestamp_field = timestamp_field
+        row = query_one("SELECT lines_done, lines_skipped FROM bulk_checkpoints WHERE job = ?", (job,))
+        self.lines_done, self.lines_skipped = (row[0], row[1] or 0) if row else (0, 0)
+
+    def row(self, record, text, fields, now):
+        # The responses row for record; ValueError says what is wrong with it
+        from db import to_epoch
+        if isinstance(record, InvalidRecord):
+            raise ValueError(record.problem)
+        user = record.get(self.user_field)
+        if user is None or str(user).strip() == "":
+            raise ValueError(f"missing {self.user_field}")
+        try:
+            user_id = int(user)
+        except (TypeError, ValueError):
+            raise ValueError(f"{self.user_field} {user!r} is not an integer") from None
+        timestamp = record.get(self.timestamp_field) or now
+        try:
+            to_epoch(timestamp)
+        except (TypeError, ValueError):
+            raise ValueError(f"{self.timestamp_field} {timestamp!r} is not an ISO date") from None
+        return (user_id, record.get(self.question_field), text,
+                fields["sentiment"], fields["emotion"], fields["confidence"], timestamp)
+
+    def write(self, records, texts, scored):
+        from db import insert_responses, transaction
+        now = datetime.now().isoformat()
+        rows, skipped = [], 0
+        for i, (record, text, fields) in enumerate(zip(records, texts, scored)):
+            try:
+                rows.append(self.row(record, text, fields, now))
+            except ValueError as e:
+                skipped += 1
+                skip_line(self.lines_done + i + 1, e)
+        with transaction() as conn:
+            insert_responses(conn, rows, model_version=self.model_version)
+            conn.execute("""
+                INSERT INTO bulk_checkpoints (job, lines_done, lines_skipped, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(job) DO UPDATE SET lines_done = excluded.lines_done,
+                    lines_skipped = excluded.lines_skipped, updated_at = excluded.updated_at
+            """, (self.job, self.lines_done + len(records), self.lines_skipped + skipped, now))
+        self.lines_done += len(records)
+        self.lines_skipped += skipped
+
+    def close(self):
+        pass
+
+def run(args):
+    if args.to_db:
+        from scorers import get_scorer
+        sink = DbSink(f"{os.path.abspath(args.input)}:{args.scorer}", get_scorer(args.scorer).model_tag,
+                      args.user_field, args.question_field, args.timestamp_field)
+    else:
+        output = args.output or os.path.splitext(args.input)[0] + ".scored.jsonl"
+        sink = FileSink(output, args.checkpoint or output + ".ckpt")
+
+    records = read_records(args.input)
+    skipped = sink.lines_done
+    if skipped:
+        print(f"Resuming after {skipped} lines", file=sys.stderr)
+        for _ in islice(records, skipped):
+            pass
+
+    started = last_report = time.monotonic()
+    done = 0
+    # Results are written in input order so the checkpoint is always a clean prefix
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.scorer, not args.no_cache)) as pool:
+        def drain(limit):
+            nonlocal done, last_report
+            while len(in_flight) > limit:
+                chunk, texts, future = in_flight.popleft()
+                sink.write(chunk, texts, future.result())
+                done += len(chunk)
+                now = time.monotonic()
+                if now - last_report >= args.report_every:
+                    last_report = now
+                    print(f"{skipped + done} lines, {done / (now - started):.1f} lines/s", file=sys.stderr)
+
+        for chunk in chunked(records, args.chunk_size):
+            texts = [str(record.get(args.text_field) or "") if isinstance(record, dict) else "" for record in chunk]
+            in_flight.append((chunk, texts, pool.submit(_score_chunk, texts, args.batch_size)))
+            drain(args.workers * 2)
+        drain(0)
+    sink.close()
+
+    elapsed = time.monotonic() - started
+    rate = done / elapsed if elapsed else 0.0
+    print(f"Scored {done} lines in {elapsed:.1f}s ({rate:.1f} lines/s), {skipped + done} total", file=sys.stderr)
+    if sink.lines_skipped:
+        print(f"{sink.lines_skipped} lines skipped as invalid", file=sys.stderr)
+    return done
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a JSONL/CSV export of answers without the GUI.")
+    parser.add_argument("input", help="JSONL or CSV file, one answer per record")
+    parser.add_argument("--scorer", default="lexicon", help="backend registered in scorers.SCORERS")
+    parser.add_argument("--text-field", default="answer")
+    parser.add_argument("--output", help="JSONL output path (default: <input>.scored.jsonl)")
+    parser.add_argument("--checkpoint", help="checkpoint path for file output (default: <output>.ckpt)")
+    parser.add_argument("--to-db", action="store_true", help="insert into the responses table instead of a file")
+    parser.add_argument("--user-field", default="user_id")
+    parser.add_argument("--question-field", default="question")
+    parser.add_argument("--timestamp-field", default="timestamp")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=512, help="records per work unit")
+    parser.add_argument("--batch-size", type=int, default=32, help="texts per model forward pass")
+    parser.add_argument("--no-cache", action="store_true", help="skip the sentiment result cache")
+    parser.add_argument("--report-every", type=float, default=5.0, help="seconds between progress lines")
+    run(parser.parse_args(argv))
+
+if __name__ == "__main__":
+    main()
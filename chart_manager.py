@@ -0,0 +1,286 @@
+import threading
+from array import array
+from collections import OrderedDict
+from io import BytesIO
+import numpy as np
+from matplotlib.figure import Figure
+from db import snapshot
+from timeseries import day_epochs, plot_series, set_series
+from metrics import counter, timed
+
+# Mood charts kept between views instead of rebuilt on every click. Each
+# (user, chart kind) keeps the series behind its chart and the highest
+# responses.id folded into it, so a refresh only reads newer answers. While
+# a window shows the chart its one Figure is updated in place; the Figure is
+# released when the window closes. Rendered PNGs are cached by
+# (user, kind, last id, row count, update count) for reports. Deleting
+# answers (the count no longer adds up) or rewriting them in place, e.g.
+# re-scoring (user_summary.updates moved), triggers a full reload.
+
+MAX_CHARTS = 16   # series kept, least recently used dropped first
+MAX_IMAGES = 32   # rendered PNGs kept
+
+class MoodChart:
+    kind = None
+    title = None
+    ylabel = None
+    xlabel = None
+    color = None
+    figsize = (6, 3)
+    grid = False
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.last_id = 0    # highest responses.id folded into the series
+        self.count = 0      # the user's answers at that point
+        self.updates = 0    # user_summary.updates at that point
+        self.version = 0    # bumped whenever the series changes
+        self.drawn = -1     # version the figure shows
+        self.figure = None
+        self.line = None
+        self.canvas = None  # FigureCanvasTkAgg while shown in a window
+        self.window = None
+        self.lock = threading.RLock()
+        self.reset()
+
+    def reset(self):
+        raise NotImplementedError
+
+    def load(self, conn, after_id):
+        # Folds in the user's rows with id > after_id
+        raise NotImplementedError
+
+    def series(self):
+        # (epochs, values), oldest first
+        raise NotImplementedError
+
+    @property
+    def empty(self):
+        return len(self.series()[0]) == 0
+
+    @property
+    def shown(self):
+        return self.window is not None
+
+    @timed("chart.refresh")
+    def refresh(self):
+        # Brings the series up to date; True if it changed. The user's totals
+        # come from user_summary; only rows newer than last_id are counted.
+        with self.lock, snapshot() as conn:
+            total, updates = conn.execute(
+                "SELECT total, updates FROM user_summary WHERE user_id = ?", (self.user_id,)).fetchone() or (0, 0)
+            added, newest = 0, None
+            if self.last_id:
+                # A range scan on the rowid; +user_id keeps the planner off the per-user index
+                added, newest = conn.execute(
+                    "SELECT COUNT(*), MAX(id) FROM responses WHERE id > ? AND +user_id = ?",
+                    (self.last_id, self.user_id)).fetchone()
+            if not added and total == self.count and updates == self.updates:
+                counter("chart.unchanged").inc()
+                return False
+            if not self.last_id or self.count + added != total or updates != self.updates:
+                if self.last_id:
+                    counter("chart.reload").inc()
+                self.reset()
+                self.load(conn, 0)
+                newest = conn.execute("SELECT MAX(id) FROM responses WHERE user_id = ?", (self.user_id,)).fetchone()[0]
+            else:
+                self.load(conn, self.last_id)
+            self.last_id, self.count, self.updates = newest or 0, total, updates
+            self.version += 1
+            return True
+
+    def draw(self):
+        # Creates the figure on first use, afterwards only swaps the line's data
+        with self.lock:
+            if self.figure is None:
+                self.figure = Figure(figsize=self.figsize)
+                ax = self.figure.subplots()
+                plot_series(ax, *self.series(), width_inches=self.figsize[0], color=self.color, dpi=self.figure.dpi)
+                self.line = ax.lines[-1]
+                ax.set_title(self.title)
+                ax.set_ylabel(self.ylabel)
+                if self.xlabel:
+                    ax.set_xlabel(self.xlabel)
+                ax.set_ylim(0, 100)
+                ax.grid(self.grid)
+                self.figure.tight_layout()
+            elif self.drawn != self.version:
+                set_series(self.line, *self.series(), width_inches=self.figsize[0], dpi=self.figure.dpi)
+                ax = self.line.axes
+                ax.relim()
+                ax.autoscale_view(scaley=False)
+            else:
+                return False
+            self.drawn = self.version
+            if self.canvas is not None:
+                self.canvas.draw_idle()
+            return True
+
+    def show(self, master, **pack_options):
+        # Embeds the chart in master; the figure is released when master is destroyed
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        with self.lock:
+            self.draw()
+            self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+            self.canvas.draw()
+            self.canvas.get_tk_widget().pack(**pack_options)
+            self.window = master
+        master.bind("<Destroy>", self._destroyed, add="+")
+
+    def _destroyed(self, event):
+        # <Destroy> is also delivered for each child of the window
+        if self.window is not None and str(event.widget) == str(self.window):
+            self.close()
+
+    def render_png(self):
+        with self.lock:
+            self.draw()
+            buffer = BytesIO()
+            self.figure.savefig(buffer, format="png")
+            if not self.shown:
+                self.close()
+            return buffer.getvalue()
+
+    def close(self):
+        # Releases the figure; the series stays, so reopening only reads newer rows
+        with self.lock:
+            if self.figure is not None:
+                self.figure.clear()
+            self.figure = self.line = self.canvas = self.window = None
+            self.drawn = -1
+
+class ConfidenceChart(MoodChart):
+    # Every answer's confidence over time
+    kind = "confidence"
+    title = "Mood Confidence Over Time"
+    ylabel = "Confidence (%)"
+    color = "blue"
+
+    def reset(self):
+        self.epochs, self.values = array("d"), array("d")
+
+    def load(self, conn, after_id):
+        rows = conn.execute("""
+            SELECT created_at, confidence FROM responses
+            WHERE user_id = ? AND id > ? ORDER BY created_at, id
+        """, (self.user_id, after_id)).fetchall()
+        if not rows:
+            return
+        backdated = len(self.epochs) and rows[0][0] is not None and rows[0][0] < self.epochs[-1]
+        self.epochs.extend(r[0] or 0 for r in rows)
+        self.values.extend(r[1] or 0.0 for r in rows)
+        if backdated:
+            # Imported answers can predate ones already shown
+            order = np.argsort(np.frombuffer(self.epochs, dtype=np.float64), kind="stable")
+            self.epochs = array("d", np.frombuffer(self.epochs, dtype=np.float64)[order].tobytes())
+            self.values = array("d", np.frombuffer(self.values, dtype=np.float64)[order].tobytes())
+
+    def series(self):
+        return self.epochs, self.values
+
+class DailyPositiveChart(MoodChart):
+    # Daily average confidence of positive answers
+    kind = "daily_positive"
+    title = "Daily Average Positive Mood Confidence"
+    ylabel = "Average Confidence (%)"
+    xlabel = "Date"
+    color = "green"
+    figsize = (8, 5)
+    grid = True
+
+    def reset(self):
+        self.days = {}  # 'YYYY-MM-DD' -> [answers, confidence sum]
+        self._series = None
+
+    def load(self, conn, after_id):
+        if after_id == 0:
+            # Full history from the rollups, O(days); the snapshot keeps them
+            # consistent with the last id refresh() records
+            rows = conn.execute("""
+                SELECT day, n, confidence_sum FROM daily_mood
+                WHERE user_id = ? AND sentiment = 'POSITIVE' AND n > 0
+            """, (self.user_id,)).fetchall()
+        else:
+            # Same bucketing as the rollup triggers
+            rows = conn.execute("""
+                SELECT date(created_at, 'unixepoch', 'localtime'), COUNT(*), SUM(COALESCE(confidence, 0))
+                FROM responses WHERE user_id = ? AND id > ? AND sentiment = 'POSITIVE'
+                GROUP BY 1
+            """, (self.user_id, after_id)).fetchall()
+        for day, n, total in rows:
+            bucket = self.days.setdefault(day, [0, 0.0])
+            bucket[0] += n
+            bucket[1] += total
+        if rows:
+            self._series = None
+
+    def series(self):
+        if self._series is None:
+            days = sorted(self.days)
+            self._series = (day_epochs(days), [self.days[d][1] / self.days[d][0] for d in days])
+        return self._series
+
+CHARTS = {
+    ConfidenceChart.kind: ConfidenceChart,
+    DailyPositiveChart.kind: DailyPositiveChart,
+}
+
+class ChartManager:
+    def __init__(self, max_charts=MAX_CHARTS, max_images=MAX_IMAGES):
+        self.max_charts = max_charts
+        self.max_images = max_images
+        self._charts = OrderedDict()
+        self._images = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, kind):
+        key = (user_id, kind)
+        with self._lock:
+            chart = self._charts.get(key)
+            if chart is None:
+                chart = self._charts[key] = CHARTS[kind](user_id)
+            self._charts.move_to_end(key)
+            # Charts on screen are never dropped
+            for old in [k for k, c in self._charts.items() if not c.shown][:max(0, len(self._charts) - self.max_charts)]:
+                self._charts.pop(old).close()
+        return chart
+
+    def png(self, user_id, kind=ConfidenceChart.kind):
+        # BytesIO with the chart as of now, or None if it has no data
+        chart = self.get(user_id, kind)
+        chart.refresh()
+        if chart.empty:
+            return None
+        key = (user_id, kind, chart.last_id, chart.count, chart.updates)
+        with self._lock:
+            data = self._images.get(key)
+            if data is not None:
+                self._images.move_to_end(key)
+        if data is None:
+            counter("chart.png_miss").inc()
+            with timed("chart.render"):
+                data = chart.render_png()
+            with self._lock:
+                self._images[key] = data
+                while len(self._images) > self.max_images:
+                    self._images.popitem(last=False)
+        else:
+            counter("chart.png_hit").inc()
+        return BytesIO(data)
+
+    def release(self, user_id=None):
+        # Drops a user's charts and images (all of them with no user), e.g. on logout
+        with self._lock:
+            for key in [k for k in self._charts if user_id is None or k[0] == user_id]:
+                self._charts.pop(key).close()
+            for key in [k for k in self._images if user_id is None or k[0] == user_id]:
+                del self._images[key]
+
+_default_manager = None
+
+def get_manager():
+    global _default_manager
+    if _default_manager is None:
+        _default_manager = ChartManager()
+    return _default_manager
@@ -0,0 +1,87 @@
+from metrics import counter
+
+# Tokenizer-aware preparation of texts for the transformer scorers. Each text
+# is tokenized once; texts longer than the model's window are split into
+# overlapping windows instead of being truncated, and windows are batched by
+# length so a batch is only padded to what its members need. Per-window
+# outputs are averaged back into one row per text, weighted by window length.
+
+OVERLAP = 64               # tokens shared by consecutive windows
+MAX_BATCH_TOKENS = 8192    # padded tokens per forward pass
+MAX_MODEL_LENGTH = 512
+# Part of the transformer scorers' versions: results for long texts change with these settings
+WINDOWING = f"w{MAX_MODEL_LENGTH}o{OVERLAP}"
+
+def split_windows(ids, size, overlap=OVERLAP):
+    if len(ids) <= size:
+        return [ids]
+    step = size - overlap
+    windows = []
+    for start in range(0, len(ids), step):
+        windows.append(ids[start:start + size])
+        if start + size >= len(ids):
+            break
+    return windows
+
+def plan(tokenizer, texts, max_length=None, overlap=OVERLAP):
+    # [(text index, token ids without special tokens)], one entry per window
+    max_length = min(max_length or tokenizer.model_max_length, MAX_MODEL_LENGTH)
+    size = max_length - tokenizer.num_special_tokens_to_add()
+    encoded = tokenizer(list(texts), add_special_tokens=False, truncation=False, verbose=False)["input_ids"]
+    return [(i, window) for i, ids in enumerate(encoded) for window in split_windows(ids, size, overlap)]
+
+def length_batches(lengths, batch_size, max_batch_tokens=MAX_BATCH_TOKENS):
+    # Groups indices of similar length: at most batch_size per batch and at
+    # most max_batch_tokens once padded to the batch's longest member
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches, batch = [], []
+    for i in order:
+        # Ascending order, so the newcomer sets the padded width
+        if batch and (len(batch) >= batch_size or (len(batch) + 1) * lengths[i] > max_batch_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+def encode_batch(tokenizer, token_lists, device=None):
+    import torch
+    rows = [tokenizer.build_inputs_with_special_tokens(ids) for ids in token_lists]
+    width = max(len(row) for row in rows)
+    input_ids = torch.full((len(rows), width), tokenizer.pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(rows), width), dtype=torch.long)
+    for r, row in enumerate(rows):
+        input_ids[r, :len(row)] = torch.tensor(row)
+        attention_mask[r, :len(row)] = 1
+    if device is not None:
+        input_ids, attention_mask = input_ids.to(device), attention_mask.to(device)
+    return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+def score_windows(tokenizer, forward, texts, batch_size=16, max_length=None, device=None):
+    # forward(encoded) -> (windows, k) tensor, e.g. class probabilities.
+    # Returns one list of k length-weighted averages per text.
+    import torch
+    pieces = plan(tokenizer, texts, max_length)
+    outputs = [None] * len(pieces)
+    real = padded = 0
+    with torch.inference_mode():
+        for batch in length_batches([len(ids) for _, ids in pieces], batch_size):
+            encoded = encode_batch(tokenizer, [pieces[i][1] for i in batch], device)
+            for i, row in zip(batch, forward(encoded).tolist()):
+                outputs[i] = row
+            real += int(encoded["attention_mask"].sum())
+            padded += encoded["attention_mask"].numel()
+    counter("tokens.real").inc(real)
+    counter("tokens.padded").inc(padded)
+
+    sums = [None] * len(texts)
+    weights = [0] * len(texts)
+    for (text_index, ids), row in zip(pieces, outputs):
+        weight = max(len(ids), 1)
+        weights[text_index] += weight
+        if sums[text_index] is None:
+            sums[text_index] = [v * weight for v in row]
+        else:
+            sums[text_index] = [s + v * weight for s, v in zip(sums[text_index], row)]
+    return [[s / weights[i] for s in sums[i]] for i in range(len(texts))]
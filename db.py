@@ -1,51 +1,125 @@
+import os
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
+from metrics import timed
 
-def connect_db():
-    return sqlite3.connect("mental_health.db")
+DB_NAME = os.environ.get("MENTAL_HEALTH_DB", "mental_health.db")
+
+# Applied once to every new connection. WAL lets readers run alongside the
+# writer, and synchronous=NORMAL only fsyncs at checkpoints instead of on
+# every commit (still safe against corruption in WAL mode).
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # 16 MB page cache
+    "PRAGMA mmap_size=268435456",    # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+# Connections inherited across fork() must never be used or closed by the
+# child; they are parked here so garbage collection doesn't close them either.
+_inherited = []
+
+def connect_db(path=None):
+    # Returns this thread's connection to path, opening it on first use.
+    # Connections are reused for the life of the thread, so don't close them.
+    path = path or DB_NAME
+    conns = getattr(_local, "conns", None)
+    if conns is None or _local.pid != os.getpid():
+        _inherited.extend((conns or {}).values())
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is None:
+        # isolation_level=None: statements autocommit unless inside transaction()
+        conn = sqlite3.connect(path, isolation_level=None, cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        conns[path] = conn
+    return conn
+
+def close_db():
+    # Closes the calling thread's connections, e.g. before a worker thread exits
+    if getattr(_local, "pid", None) == os.getpid():
+        for conn in _local.conns.values():
+            conn.close()
+    _local.conns = {}
+    _local.pid = os.getpid()
+
+@contextmanager
+def transaction(path=None):
+    # with transaction() as conn: ...  commits on success, rolls back on error.
+    # Nested use joins the outer transaction.
+    conn = connect_db(path)
+    if conn.in_transaction:
+        yield conn
+        return
+    # db.begin is time spent waiting for the write lock, db.commit the WAL write
+    with timed("db.begin"):
+        conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    with timed("db.commit"):
+        conn.execute("COMMIT")
+
+@contextmanager
+def snapshot(path=None):
+    # with snapshot() as conn: reads in the block all see the same state of
+    # the database. Nested use joins the enclosing transaction.
+    conn = connect_db(path)
+    if conn.in_transaction:
+        yield conn
+        return
+    conn.execute("BEGIN")
+    try:
+        yield conn
+    finally:
+        conn.execute("COMMIT")
+
+@timed("db.query")
+def query(sql, params=(), path=None):
+    return connect_db(path).execute(sql, params).fetchall()
+
+@timed("db.query")
+def query_one(sql, params=(), path=None):
+    return connect_db(path).execute(sql, params).fetchone()
 
 def create_tables():
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS responses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            question TEXT,
-            answer TEXT,
-            sentiment TEXT,
-            emotion TEXT,
-            confidence REAL,
-            timestamp TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    """)
-    conn.commit()
-    conn.close()
+    # The schema lives in migrations.py; this brings any database up to date
+    from migrations import migrate
+    migrate()
+
+def to_epoch(timestamp):
+    return int(datetime.fromisoformat(timestamp).timestamp())
+
+@timed("db.insert")
+def insert_responses(conn, rows, model_version=None):
+    # rows: (user_id, question, answer, sentiment, emotion, confidence, timestamp).
+    # Also folds the rows into trends.py's per-user state in the same transaction.
+    from trends import record
+    rows = [(*row, to_epoch(row[6]), model_version) for row in rows]
+    conn.executemany("""
+        INSERT INTO responses (user_id, question, answer, sentiment, emotion, confidence, timestamp, created_at, model_version)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    record(conn, [(row[0], row[3], row[5], row[7]) for row in rows])
 
 def register_user(username, password):
-    conn = connect_db()
-    cursor = conn.cursor()
     try:
-        cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
-        conn.commit()
+        with transaction() as conn:
+            conn.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
         return True
     except sqlite3.IntegrityError:
         return False
-    finally:
-        conn.close()
 
 def login_user(username, password):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM users WHERE username=? AND password=?", (username, password))
-    result = cursor.fetchone()
-    conn.close()
+    result = query_one("SELECT id FROM users WHERE username=? AND password=?", (username, password))
     return result[0] if result else None
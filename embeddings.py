@@ -0,0 +1,308 @@
+import argparse
+import json
+import os
+import sys
+import numpy as np
+from db import query
+from model_loader import LazyModel
+from metrics import counter, timed
+
+# Sentence embeddings of stored answers, for "you wrote something similar on
+# March 3" and for grouping a user's recurring concerns:
+#   python embeddings.py sync                 embed answers added since the last sync
+#   python embeddings.py similar RESPONSE_ID  the same user's most similar answers
+#   python embeddings.py index                optional IVF index for cross-user search
+#
+# The store is three append-only raw files sharing a prefix: <prefix>.f32 is
+# an (n, dim) float32 matrix of L2-normalised vectors, opened with np.memmap,
+# and <prefix>.ids / <prefix>.users hold each row's responses.id and user_id
+# as int64. New answers are appended; nothing is rewritten. <prefix>.json
+# records the model and dimension so a model change forces a rebuild.
+
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+STORE_PREFIX = os.environ.get("MINDAURA_EMBEDDINGS", "embeddings/answers")
+SYNC_CHUNK = 512
+
+class Embedder:
+    # Mean-pooled transformer embeddings, computed in padded batches
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        self.model_name = model_name
+        self.model = LazyModel(self.load_model, name="embeddings", label="Embedding model")
+
+    def load_model(self):
+        import model_registry  # deferred: importing torch takes seconds
+        return model_registry.load(self.model_name, task="base")
+
+    @property
+    def dim(self):
+        return self.model.get()[1].config.hidden_size
+
+    def embed(self, texts, batch_size=32):
+        # (len(texts), dim) float32, rows L2-normalised
+        import torch
+        tokenizer, model = self.model.get()
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        with timed("embed"), torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                encoded = tokenizer(texts[start:start + batch_size], padding=True, truncation=True, return_tensors="pt")
+                hidden = model(**encoded).last_hidden_state
+                mask = encoded["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+                out[start:start + len(pooled)] = torch.nn.functional.normalize(pooled, dim=-1).numpy()
+        counter("embedded").inc(len(texts))
+        return out
+
+class EmbeddingStore:
+    def __init__(self, prefix=STORE_PREFIX, dim=None, model_name=EMBEDDING_MODEL):
+        self.prefix = prefix
+        meta = self._read_meta()
+        if meta and (meta["model"] != model_name or (dim and meta["dim"] != dim)):
+            raise ValueError(f"{prefix} holds {meta['model']} ({meta['dim']}d) embeddings; rebuild it for {model_name}")
+        self.dim = meta["dim"] if meta else dim
+        self.model_name = model_name
+        self._matrix = None
+        self._ids = None
+        self._users = None
+        self._by_user = None
+        self.index = None
+        if self.dim:
+            self._recover()
+        if os.path.exists(self.prefix + ".ivf.npz"):
+            self.load_index()
+
+    def _read_meta(self):
+        try:
+            with open(self.prefix + ".json") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _recover(self):
+        # A crash mid-append can leave the three files with different row counts;
+        # the ids file is written last, so trim the others back to it
+        rows = min(os.path.getsize(self.prefix + ext) // size if os.path.exists(self.prefix + ext) else 0
+                   for ext, size in ((".f32", 4 * self.dim), (".users", 8), (".ids", 8)))
+        for ext, size in ((".f32", 4 * self.dim), (".users", 8), (".ids", 8)):
+            if os.path.exists(self.prefix + ext) and os.path.getsize(self.prefix + ext) != rows * size:
+                with open(self.prefix + ext, "r+b") as f:
+                    f.truncate(rows * size)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def matrix(self):
+        if self._matrix is None:
+            rows = len(self.ids)
+            self._matrix = (np.memmap(self.prefix + ".f32", dtype=np.float32, mode="r", shape=(rows, self.dim))
+                            if rows else np.empty((0, self.dim or 0), dtype=np.float32))
+        return self._matrix
+
+    @property
+    def ids(self):
+        if self._ids is None:
+            self._ids = np.fromfile(self.prefix + ".ids", dtype=np.int64) if os.path.exists(self.prefix + ".ids") else np.empty(0, np.int64)
+        return self._ids
+
+    @property
+    def users(self):
+        if self._users is None:
+            self._users = np.fromfile(self.prefix + ".users", dtype=np.int64, count=len(self.ids)) if len(self.ids) else np.empty(0, np.int64)
+        return self._users
+
+    @property
+    def last_id(self):
+        return int(self.ids[-1]) if len(self.ids) else 0
+
+    def append(self, response_ids, user_ids, vectors):
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+            os.makedirs(os.path.dirname(self.prefix) or ".", exist_ok=True)
+            with open(self.prefix + ".json", "w") as f:
+                json.dump({"model": self.model_name, "dim": self.dim}, f)
+        first_row = len(self.ids)
+        self._matrix = None  # release the mapping before the file grows
+        with open(self.prefix + ".f32", "ab") as f:
+            f.write(vectors.tobytes())
+        with open(self.prefix + ".users", "ab") as f:
+            f.write(np.asarray(user_ids, dtype=np.int64).tobytes())
+        with open(self.prefix + ".ids", "ab") as f:
+            f.write(np.asarray(response_ids, dtype=np.int64).tobytes())
+        self._ids = self._users = self._by_user = None
+        if self.index is not None:
+            self.index.add(np.arange(first_row, first_row + len(vectors)), vectors)
+
+    def load_index(self):
+        # Attaches the saved IVF index and adds any rows appended since it was saved
+        self.index = IVFIndex.load(self.prefix + ".ivf.npz")
+        indexed = sum(len(l) for l in self.index.lists)
+        for start in range(indexed, len(self), 65_536):
+            block = np.asarray(self.matrix[start:start + 65_536])
+            self.index.add(np.arange(start, start + len(block)), block)
+
+    def save_index(self):
+        if self.index is not None:
+            self.index.save(self.prefix + ".ivf.npz")
+
+    def user_rows(self, user_id):
+        # Row numbers of one user's answers, via a sorted copy of the users column
+        if self._by_user is None:
+            order = np.argsort(self.users, kind="stable")
+            self._by_user = (order, self.users[order])
+        order, sorted_users = self._by_user
+        lo, hi = np.searchsorted(sorted_users, [user_id, user_id + 1])
+        return order[lo:hi]
+
+    def vector(self, response_id):
+        row = np.searchsorted(self.ids, response_id)  # ids are appended in increasing order
+        if row < len(self.ids) and self.ids[row] == response_id:
+            return self.matrix[row], row
+        return None, None
+
+    @timed("embeddings.search")
+    def search(self, query_vector, k=5, user_id=None, exclude_rows=()):
+        # [(response_id, cosine similarity)], best first. Exact for one user's
+        # answers; over the whole corpus it uses the approximate index if one is attached.
+        q = np.asarray(query_vector, dtype=np.float32)
+        if user_id is not None:
+            rows = self.user_rows(user_id)
+        elif self.index is not None:
+            rows = self.index.candidates(q)
+        else:
+            rows = np.arange(len(self.ids))
+        if len(exclude_rows):
+            rows = rows[~np.isin(rows, exclude_rows)]
+        if not len(rows):
+            return []
+        scores = self.matrix[rows] @ q
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(self.ids[rows[i]]), float(scores[i])) for i in top]
+
+def kmeans(vectors, n_clusters, iterations=20, seed=0):
+    # Spherical k-means on normalised vectors: (centroids, assignment)
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = vectors[assignment == c]
+            if len(members):
+                centroid = members.sum(axis=0)
+                centroids[c] = centroid / (np.linalg.norm(centroid) or 1.0)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+class IVFIndex:
+    # Inverted-file index for large corpora: vectors are bucketed by their
+    # nearest k-means centroid and a search only scores the nprobe closest
+    # buckets. New rows are added to their nearest bucket as they are appended.
+    def __init__(self, centroids, lists, nprobe=8):
+        self.centroids = centroids
+        self.lists = lists
+        self.nprobe = nprobe
+
+    @classmethod
+    def train(cls, store, n_lists=None, nprobe=8, sample=50_000, seed=0):
+        rows = len(store)
+        n_lists = n_lists or max(1, int(np.sqrt(rows)))
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(rows, min(sample, rows), replace=False))
+        centroids, _ = kmeans(np.asarray(store.matrix[sample_rows]), n_lists, seed=seed)
+        index = cls(centroids, [np.empty(0, np.int64) for _ in range(len(centroids))], nprobe)
+        for start in range(0, rows, 65_536):
+            block = np.asarray(store.matrix[start:start + 65_536])
+            index.add(np.arange(start, start + len(block)), block)
+        return index
+
+    def add(self, rows, vectors):
+        assignment = np.argmax(vectors @ self.centroids.T, axis=1)
+        for c in np.unique(assignment):
+            self.lists[c] = np.concatenate([self.lists[c], rows[assignment == c]])
+
+    def candidates(self, query_vector):
+        probe = np.argsort(-(self.centroids @ query_vector))[:self.nprobe]
+        return np.sort(np.concatenate([self.lists[c] for c in probe]))
+
+    def save(self, path):
+        np.savez(path, centroids=self.centroids, nprobe=self.nprobe,
+                 sizes=np.array([len(l) for l in self.lists]), rows=np.concatenate(self.lists))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        bounds = np.cumsum(data["sizes"])[:-1]
+        return cls(data["centroids"], np.split(data["rows"], bounds), int(data["nprobe"]))
+
+def sync(store, embedder, chunk=SYNC_CHUNK, progress=None):
+    # Embeds and appends every answer newer than the store's last row; returns the count
+    added = 0
+    while True:
+        rows = query("SELECT id, user_id, answer FROM responses WHERE id > ? ORDER BY id LIMIT ?",
+                     (store.last_id, chunk))
+        if not rows:
+            return added
+        vectors = embedder.embed([answer or "" for _, _, answer in rows])
+        store.append([r[0] for r in rows], [r[1] for r in rows], vectors)
+        added += len(rows)
+        if progress:
+            progress(added, store.last_id)
+
+def similar_answers(store, response_id, k=5):
+    # The same user's other answers closest to this one:
+    # [(similarity, id, question, answer, timestamp)]
+    vector, row = store.vector(response_id)
+    if vector is None:
+        return []
+    user_id = int(store.users[row])
+    hits = store.search(vector, k=k, user_id=user_id, exclude_rows=[row])
+    if not hits:
+        return []
+    similarity = dict(hits)
+    placeholders = ",".join("?" * len(hits))
+    rows = query(f"SELECT id, question, answer, timestamp FROM responses WHERE id IN ({placeholders})",
+                 [i for i, _ in hits])
+    return sorted(((similarity[r[0]], *r) for r in rows), reverse=True)
+
+def recurring_concerns(store, user_id, n_clusters=5):
+    # Groups one user's answers by topic: [(size, [response ids nearest the centre first])], largest first
+    rows = store.user_rows(user_id)
+    if not len(rows):
+        return []
+    vectors = np.asarray(store.matrix[rows])
+    centroids, assignment = kmeans(vectors, n_clusters)
+    groups = []
+    for c in range(len(centroids)):
+        members = np.flatnonzero(assignment == c)
+        if len(members):
+            order = members[np.argsort(-(vectors[members] @ centroids[c]))]
+            groups.append((len(members), [int(store.ids[rows[i]]) for i in order]))
+    return sorted(groups, key=lambda g: -g[0])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embed stored answers and look up similar ones.")
+    parser.add_argument("command", choices=["sync", "similar", "index"])
+    parser.add_argument("response_id", type=int, nargs="?")
+    parser.add_argument("--store", default=STORE_PREFIX)
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    store = EmbeddingStore(args.store)
+    if args.command == "sync":
+        added = sync(store, Embedder(), progress=lambda n, last: print(f"{n} embedded (id {last})", file=sys.stderr))
+        store.save_index()
+        print(f"Embedded {added} new answers; store has {len(store)}", file=sys.stderr)
+    elif args.command == "index":
+        # Optional: only worth it for cross-user searches on large stores
+        store.index = IVFIndex.train(store)
+        store.save_index()
+        print(f"Indexed {len(store)} vectors", file=sys.stderr)
+    else:
+        if args.response_id is None:
+            parser.error("similar needs a RESPONSE_ID")
+        for similarity, _, question, answer, timestamp in similar_answers(store, args.response_id, args.k):
+            print(f"{similarity:.2f}  {timestamp[:10]}  {answer}")
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,36 @@
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from tkinter import messagebox
 import customtkinter as ctk
-from db import connect_db
-from datetime import datetime
+from chart_manager import get_manager
+from search_panel import SearchPanel
+from metrics import timed
 
-def show_mood_graph(root, user_id):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT
-            DATE(timestamp) as date,
-            AVG(confidence)
-        FROM responses
-        WHERE user_id = ? AND sentiment = 'POSITIVE'
-        GROUP BY DATE(timestamp)
-        ORDER BY DATE(timestamp)
-    """, (user_id,))
-    records = cursor.fetchall()
-    conn.close()
-
-    if not records:
-        ctk.CTkMessagebox.show_info("No Data", "No positive mood records found.")
-        return
-
-    dates = [datetime.strptime(r[0], '%Y-%m-%d') for r in records]
-    avg_confidence = [r[1] for r in records]
+def show_chart(root, user_id, kind, title, empty_message, geometry=None):
+    # Opens the chart beside a search panel. While its window is open, asking
+    # again brings it to the front with any new answers added.
+    chart = get_manager().get(user_id, kind)
+    chart.refresh()
 
-    fig, ax = plt.subplots(figsize=(8, 5))
-    ax.plot(dates, avg_confidence, marker='o', linestyle='-', color='green')  # Changed color to green
-    ax.set_title("Daily Average Positive Mood Confidence")  # Updated title
-    ax.set_ylabel("Average Confidence (%)")
-    ax.set_xlabel("Date")  # Simplified x-axis label
-    ax.set_ylim(0, 100)
-    ax.grid(True)
+    if chart.empty:
+        messagebox.showinfo("No Data", empty_message)
+        return None
 
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))  # Format x-axis as dates
-    ax.xaxis.set_major_locator(mdates.AutoDateLocator())
-    plt.xticks(rotation=45, ha="right")
-    fig.tight_layout()
+    if chart.shown and chart.window.winfo_exists():
+        chart.draw()
+        chart.window.lift()
+        chart.window.focus()
+        return chart.window
 
     # Popup window
     graph_win = ctk.CTkToplevel(root)
-    graph_win.title("Daily Mood Trend")  # Updated window title
-    graph_win.geometry("700x500")
+    graph_win.title(title)
+    if geometry:
+        graph_win.geometry(geometry)
 
-    chart = FigureCanvasTkAgg(fig, master=graph_win)
-    chart.draw()
-    chart.get_tk_widget().pack(fill="both", expand=True)
\ No newline at end of file
+    SearchPanel(graph_win, user_id).pack(side="right", fill="y", padx=(0, 10), pady=10)
+    chart.show(graph_win, side="left", fill="both", expand=True)
+    return graph_win
+
+@timed("chart.show")
+def show_mood_graph(root, user_id):
+    return show_chart(root, user_id, "daily_positive", "Daily Mood Trend",
+                      "No positive mood records found.", geometry="1100x500")
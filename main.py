@@ -1,12 +1,10 @@
 import customtkinter as ctk
-from mental_health_app import MentalHealthBot
-from graph_viewer import show_mood_graph
-from report_generator import generate_pdf_report
 from tkinter import messagebox, filedialog
-from db import connect_db
+from rollups import last_checkin
+from trends import get_trends
 from db import create_tables
-from datetime import datetime
 from login import LoginScreen
+import prefetch
 
 class MainMenuScreen:
     def __init__(self, root, user_id, username):
@@ -28,6 +26,15 @@ class MainMenuScreen:
         self.subtitle = ctk.CTkLabel(self.frame, text=subtitle_text, font=ctk.CTkFont(size=14), text_color="gray")
         self.subtitle.pack(pady=(0, 20))
 
+        # Read from the streaming trend state, so this costs one row lookup
+        flags = get_trends(self.user_id)["flags"]
+        if flags:
+            warning = "Your recent check-ins suggest a dip in mood: " + "; ".join(flags) + \
+                      ".\nConsider talking to someone you trust or reaching out for support."
+            self.trend_warning = ctk.CTkLabel(self.frame, text=warning, font=ctk.CTkFont(size=13),
+                                              text_color="#e0a030", wraplength=560, justify="center")
+            self.trend_warning.pack(pady=(0, 15))
+
         self.prompt = ctk.CTkLabel(self.frame, text="What would you like to do today?", font=ctk.CTkFont(size=16))
         self.prompt.pack(pady=10)
 
@@ -44,27 +51,25 @@ class MainMenuScreen:
         self.logout_btn.pack(pady=30)
 
     def get_last_checkin_date(self):
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT timestamp FROM responses WHERE user_id = ? ORDER BY timestamp DESC LIMIT 1", (self.user_id,))
-        result = cursor.fetchone()
-        conn.close()
-        if result:
-            dt = datetime.fromisoformat(result[0])
+        dt = last_checkin(self.user_id)
+        if dt:
             return dt.strftime("%b %d, %Y at %I:%M %p")
         return None
 
     def start_quiz(self):
         self.frame.destroy() 
         self.frame = None 
+        from mental_health_app import MentalHealthBot
         self.quiz_instance = MentalHealthBot(self.root, self.user_id, self.username)
         
     def view_graph(self):
+        from graph_viewer import show_mood_graph
         show_mood_graph(self.root, self.user_id)
 
     def export_report(self):
         path = filedialog.asksaveasfilename(defaultextension=".pdf", initialfile="Mental_Health_Report.pdf", filetypes=[("PDF files", "*.pdf")])
         if path:
+            from report_generator import generate_pdf_report
             result = generate_pdf_report(self.user_id, self.username, filename=path)
             if result:
                 messagebox.showinfo("Success", f"Report saved to:\n{result}")
@@ -78,6 +83,9 @@ class MainMenuScreen:
 
     def logout(self):
         print("MainMenuScreen.logout() called")
+        # Drops the user's cached charts; closing the windows below releases their figures
+        from chart_manager import get_manager
+        get_manager().release(self.user_id)
         print("Destroying MainMenuScreen widgets...")
         for widget in self.root.winfo_children():
             widget.destroy()
@@ -141,6 +149,8 @@ class WelcomeScreen:
             self.root,
             on_login_success=self.on_login_success
         )
+        # The login screen is up; load the heavy feature modules while the user types
+        self.root.after_idle(prefetch.start)
         print("WelcomeScreen.show_login() completed")
 
     def on_login_success(self, user_id, username):
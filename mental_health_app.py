@@ -1,43 +1,14 @@
 import tkinter as tk
 from tkinter import messagebox, filedialog
 import customtkinter as ctk
-from textblob import TextBlob
 from datetime import datetime
-from matplotlib import pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-from fpdf import FPDF
-import sqlite3
-
-# Database setup
-DB_NAME = "mental_health.db"
-def connect_db():
-    return sqlite3.connect(DB_NAME)
-
-def create_tables():
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password TEXT
-        )
-    """)
-    cursor.execute("""
-        CREATE TABLE IF NOT EXISTS responses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id INTEGER,
-            question TEXT,
-            answer TEXT,
-            sentiment TEXT,
-            emotion TEXT,
-            confidence REAL,
-            timestamp TEXT,
-            FOREIGN KEY(user_id) REFERENCES users(id)
-        )
-    """)
-    conn.commit()
-    conn.close()
+from db import create_tables, insert_responses, query, transaction
+from scorers import get_scorer, response_fields
+from answer_worker import AnswerWorker
+from metrics import timed
+
+# Scoring backend for answers typed into the check-in
+GUI_SCORER = "lexicon"
 
 class MentalHealthBot:
     def __init__(self, root, user_id, username):
@@ -61,6 +32,7 @@ class MentalHealthBot:
         ]
         self.current_question_index = 0
         self.responses = []
+        self.worker = AnswerWorker(self.root, self.score_answer, self.save_answers)
 
         self.frame = ctk.CTkFrame(self.root, corner_radius=15)
         self.frame.pack(padx=30, pady=30, fill="both", expand=True)
@@ -117,6 +89,8 @@ class MentalHealthBot:
             self.show_quiz_results()  #  Show results instead of "Completed" message
 
     def handle_response(self):
+        if self.current_question_index >= len(self.questions):
+            return
         user_response = self.entry.get().strip()
         if not user_response:
             messagebox.showwarning("Input Error", "Please enter a response.")
@@ -126,34 +100,40 @@ class MentalHealthBot:
             return
 
         question = self.questions[self.current_question_index]
-        blob = TextBlob(user_response)
-        sentiment_score = blob.sentiment.polarity
-        sentiment_label = "POSITIVE" if sentiment_score > 0.1 else "NEGATIVE" if sentiment_score < -0.1 else "NEUTRAL"
-        emotion_label = "Joy" if sentiment_score > 0.3 else "Sadness" if sentiment_score < -0.3 else "Neutral"
-        confidence = round(abs(sentiment_score) * 100, 1)
-
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO responses (user_id, question, answer, sentiment, emotion, confidence, timestamp)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (self.user_id, question, user_response, sentiment_label, emotion_label, confidence, datetime.now().isoformat()))
-        conn.commit()
-        conn.close()
-
-        self.responses.append({  # Store the response with score
-            "question": question,
-            "answer": user_response,
-            "sentiment": sentiment_label,
-            "emotion": emotion_label,
-            "confidence": confidence,
-            "sentiment_score": sentiment_score # Store numerical score for analysis
-        })
+        response = {"question": question, "answer": user_response}
+        self.responses.append(response)
+        self.worker.submit((question, user_response, datetime.now().isoformat()),
+                           lambda result, error: self.record_score(response, result, error))
 
         self.current_question_index += 1
         self.display_question()
 
+    def score_answer(self, job):
+        # Runs on the worker thread
+        question, user_response, timestamp = job
+        return response_fields(get_scorer(GUI_SCORER).score(user_response))
+
+    def save_answers(self, scored):
+        # Runs on the worker thread; one commit for every answer scored since the last one
+        with transaction() as conn:
+            insert_responses(conn, [(self.user_id, question, answer, r["sentiment"], r["emotion"], r["confidence"], timestamp)
+                                    for (question, answer, timestamp), r in scored],
+                             model_version=get_scorer(GUI_SCORER).model_tag)
+
+    def record_score(self, response, result, error):
+        if error is not None:
+            messagebox.showerror("Scoring Error", f"Could not save your answer to \"{response['question']}\":\n{error}")
+            result = {"sentiment": "UNKNOWN", "emotion": "Unknown", "confidence": 0.0, "sentiment_score": 0.0}
+        response.update(result)
+
     def show_quiz_results(self):
+        if self.worker.pending:
+            # Answers are still being scored and saved; render once they are all in
+            self.question_label.configure(text="Analyzing your answers...")
+            self.entry.configure(state="disabled")
+            self.worker.when_idle(self.show_quiz_results)
+            return
+
         # Clear the existing frame
         for widget in self.frame.winfo_children():
             widget.destroy()
@@ -211,39 +191,16 @@ class MentalHealthBot:
     def close_results(self):
         self.root.destroy()  # Close the quiz window
 
+    @timed("chart.show")
     def show_mood_graph(self):
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT timestamp, emotion, confidence FROM responses WHERE user_id = ? ORDER BY timestamp", (self.user_id,))
-        data = cursor.fetchall()
-        conn.close()
-
-        if not data:
-            messagebox.showinfo("No Data", "No previous mood records found.")
-            return
-
-        timestamps = [d[0][:16].replace("T", "\n") for d in data]
-        confidence = [d[2] for d in data]
-
-        fig, ax = plt.subplots(figsize=(6, 3))
-        ax.plot(timestamps, confidence, marker='o', linestyle='-', color='blue')
-        ax.set_title("Mood Confidence Over Time")
-        ax.set_ylabel("Confidence (%)")
-        ax.set_ylim(0, 100)
-        plt.xticks(rotation=45)
-
-        chart_window = ctk.CTkToplevel(self.root)
-        chart_window.title("Mood History")
-        chart = FigureCanvasTkAgg(fig, master=chart_window)
-        chart.draw()
-        chart.get_tk_widget().pack(fill="both", expand=True)
+        # matplotlib/numpy are only needed here; importing them up front costs startup time
+        from graph_viewer import show_chart
+        show_chart(self.root, self.user_id, "confidence", "Mood History", "No previous mood records found.")
 
     def export_report(self):
-        conn = connect_db()
-        cursor = conn.cursor()
-        cursor.execute("SELECT question, answer, sentiment, emotion, confidence, timestamp FROM responses WHERE user_id=?", (self.user_id,))
-        data = cursor.fetchall()
-        conn.close()
+        from fpdf import FPDF
+
+        data = query("SELECT question, answer, sentiment, emotion, confidence, timestamp FROM responses WHERE user_id=? ORDER BY created_at, id", (self.user_id,))
 
         if not data:
             messagebox.showinfo("No Data", "No responses to export.")
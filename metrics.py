@@ -0,0 +1,196 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from functools import wraps
+
+# Lightweight in-process instrumentation. Wrap a stage with
+#   @timed("score.textblob")   or   with timed("db.query"): ...
+# and read the results from summary(), export_prometheus() or the optional
+# HTTP endpoint / per-session trace log configured below.
+#
+#   MINDAURA_METRICS_FILE=metrics.prom   written at exit (and by export_prometheus())
+#   MINDAURA_METRICS_PORT=9464           serves /metrics on localhost
+#   MINDAURA_TRACE=trace-{pid}.jsonl     one JSON line per timed call, per process
+
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+RESERVOIR_SIZE = 2048
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+class Histogram:
+    # Cumulative Prometheus-style buckets plus a ring of recent samples for quantiles
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._recent = []
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            if len(self._recent) < RESERVOIR_SIZE:
+                self._recent.append(value)
+            else:
+                self._recent[self._next] = value
+                self._next = (self._next + 1) % RESERVOIR_SIZE
+
+    def quantile(self, q):
+        with self._lock:
+            samples = sorted(self._recent)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_trace = None
+_trace_lock = threading.Lock()
+
+def histogram(stage):
+    h = _histograms.get(stage)
+    if h is None:
+        with _lock:
+            h = _histograms.setdefault(stage, Histogram())
+    return h
+
+def counter(name):
+    c = _counters.get(name)
+    if c is None:
+        with _lock:
+            c = _counters.setdefault(name, Counter())
+    return c
+
+class timed:
+    # Decorator and context manager; failures are timed too and counted in errors.<stage>
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __call__(self, fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(self.stage):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        histogram(self.stage).observe(elapsed)
+        if exc_type is not None:
+            counter(f"errors.{self.stage}").inc()
+        if _trace is not None:
+            _write_trace(self.stage, elapsed, exc_type is None)
+        return False
+
+def _write_trace(stage, elapsed, ok):
+    line = json.dumps({"ts": time.time(), "stage": stage, "seconds": round(elapsed, 6),
+                       "thread": threading.current_thread().name, "ok": ok})
+    with _trace_lock:
+        if _trace is not None:
+            _trace.write(line + "\n")
+            _trace.flush()
+
+def enable_trace(path):
+    global _trace
+    with _trace_lock:
+        if _trace is not None:
+            _trace.close()
+        _trace = open(path.replace("{pid}", str(os.getpid())), "a", encoding="utf-8")
+
+def summary():
+    # {stage: {"count", "mean_s", "p50_s", "p99_s"}} for quick inspection
+    return {stage: {"count": h.count,
+                    "mean_s": h.sum / h.count if h.count else None,
+                    "p50_s": h.quantile(0.50),
+                    "p99_s": h.quantile(0.99)}
+            for stage, h in sorted(_histograms.items())}
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+def render_prometheus():
+    lines = ["# TYPE mindaura_stage_seconds histogram"]
+    for stage, h in sorted(_histograms.items()):
+        label = _escape(stage)
+        cumulative = 0
+        for bound, count in zip(h.buckets, h.counts):
+            cumulative += count
+            lines.append(f'mindaura_stage_seconds_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'mindaura_stage_seconds_bucket{{stage="{label}",le="+Inf"}} {h.count}')
+        lines.append(f'mindaura_stage_seconds_sum{{stage="{label}"}} {h.sum}')
+        lines.append(f'mindaura_stage_seconds_count{{stage="{label}"}} {h.count}')
+    lines.append("# TYPE mindaura_stage_seconds_quantile gauge")
+    for stage, h in sorted(_histograms.items()):
+        for q in (0.5, 0.99):
+            value = h.quantile(q)
+            if value is not None:
+                lines.append(f'mindaura_stage_seconds_quantile{{stage="{_escape(stage)}",quantile="{q}"}} {value}')
+    lines.append("# TYPE mindaura_events_total counter")
+    for name, c in sorted(_counters.items()):
+        lines.append(f'mindaura_events_total{{name="{_escape(name)}"}} {c.value}')
+    return "\n".join(lines) + "\n"
+
+def export_prometheus(path=None):
+    # Atomically writes the Prometheus text format to path (default MINDAURA_METRICS_FILE)
+    text = render_prometheus()
+    path = path or os.environ.get("MINDAURA_METRICS_FILE")
+    if path:
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return text
+
+def start_http_server(port, host="127.0.0.1"):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+def configure_from_env():
+    if os.environ.get("MINDAURA_TRACE"):
+        enable_trace(os.environ["MINDAURA_TRACE"])
+    if os.environ.get("MINDAURA_METRICS_PORT"):
+        try:
+            start_http_server(int(os.environ["MINDAURA_METRICS_PORT"]))
+        except OSError:
+            pass  # another process (e.g. a pool worker's parent) already serves it
+    if os.environ.get("MINDAURA_METRICS_FILE"):
+        atexit.register(export_prometheus)
+
+configure_from_env()
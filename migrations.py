@@ -0,0 +1,228 @@
+from datetime import datetime
+from db import connect_db, transaction
+
+# Each migration runs once, in order, inside its own transaction. Append new
+# ones to the end of MIGRATIONS; never edit one that has already shipped.
+
+def _create_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            question TEXT,
+            answer TEXT,
+            sentiment TEXT,
+            emotion TEXT,
+            confidence REAL,
+            timestamp TEXT,
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """)
+
+def _index_user_timestamp(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_user_timestamp ON responses(user_id, timestamp)")
+
+def _add_created_at(conn):
+    # Unix epoch seconds. timestamp holds naive local-time ISO strings, so the
+    # 'utc' modifier converts from local time the same way datetime.timestamp() does.
+    conn.execute("ALTER TABLE responses ADD COLUMN created_at INTEGER")
+    conn.execute("UPDATE responses SET created_at = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_user_created ON responses(user_id, created_at)")
+
+def _add_rollups(conn):
+    # Kept current by triggers so every write path updates them; see rollups.py
+    # for the readers and rebuild(). Changes to the tables or triggers need a
+    # new migration.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_mood (
+            user_id INTEGER,
+            day TEXT,
+            sentiment TEXT,
+            n INTEGER,
+            confidence_sum REAL,
+            PRIMARY KEY (user_id, day, sentiment)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_summary (
+            user_id INTEGER PRIMARY KEY,
+            total INTEGER,
+            last_checkin INTEGER
+        )
+    """)
+    add = """
+        INSERT INTO daily_mood (user_id, day, sentiment, n, confidence_sum)
+        VALUES (NEW.user_id, date(NEW.created_at, 'unixepoch', 'localtime'), NEW.sentiment, 1, COALESCE(NEW.confidence, 0))
+        ON CONFLICT(user_id, day, sentiment) DO UPDATE SET
+            n = n + 1, confidence_sum = confidence_sum + excluded.confidence_sum;
+        INSERT INTO user_summary (user_id, total, last_checkin)
+        VALUES (NEW.user_id, 1, NEW.created_at)
+        ON CONFLICT(user_id) DO UPDATE SET
+            total = total + 1, last_checkin = MAX(COALESCE(last_checkin, 0), excluded.last_checkin);
+    """
+    remove = """
+        UPDATE daily_mood SET n = n - 1, confidence_sum = confidence_sum - COALESCE(OLD.confidence, 0)
+        WHERE user_id = OLD.user_id AND day = date(OLD.created_at, 'unixepoch', 'localtime') AND sentiment = OLD.sentiment;
+        DELETE FROM daily_mood
+        WHERE user_id = OLD.user_id AND day = date(OLD.created_at, 'unixepoch', 'localtime') AND sentiment = OLD.sentiment AND n <= 0;
+        UPDATE user_summary SET
+            total = total - 1,
+            last_checkin = (SELECT MAX(created_at) FROM responses WHERE user_id = OLD.user_id)
+        WHERE user_id = OLD.user_id;
+    """
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS responses_rollup_insert AFTER INSERT ON responses BEGIN {add} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS responses_rollup_delete AFTER DELETE ON responses BEGIN {remove} END")
+    conn.execute(f"""CREATE TRIGGER IF NOT EXISTS responses_rollup_update
+        AFTER UPDATE OF user_id, sentiment, confidence, created_at ON responses
+        BEGIN {remove} {add} END""")
+    conn.execute("""
+        INSERT INTO daily_mood (user_id, day, sentiment, n, confidence_sum)
+        SELECT user_id, date(created_at, 'unixepoch', 'localtime'), sentiment, COUNT(*), SUM(COALESCE(confidence, 0))
+        FROM responses
+        GROUP BY 1, 2, 3
+    """)
+    conn.execute("""
+        INSERT INTO user_summary (user_id, total, last_checkin)
+        SELECT user_id, COUNT(*), MAX(created_at) FROM responses GROUP BY user_id
+    """)
+
+def _add_bulk_checkpoints(conn):
+    # Progress of bulk_score.py jobs writing into responses, committed in the
+    # same transaction as the rows so a resumed job never double-inserts.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bulk_checkpoints (
+            job TEXT PRIMARY KEY,
+            lines_done INTEGER,
+            updated_at TEXT
+        )
+    """)
+
+def _add_model_version(conn):
+    # Which scorer produced sentiment/emotion/confidence; NULL for rows scored
+    # before this column existed. See Scorer.model_tag and rescore.py.
+    conn.execute("ALTER TABLE responses ADD COLUMN model_version TEXT")
+
+def _add_user_trends(conn):
+    # Streaming per-user trend state; updated by db.insert_responses from now on
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS user_trends (
+            user_id INTEGER PRIMARY KEY,
+            n INTEGER,
+            ewma_sum REAL,
+            ewma_weight REAL,
+            updated_at INTEGER,
+            negative_streak INTEGER,
+            last_day INTEGER,
+            days BLOB
+        )
+    """)
+    # The rows are derived state in trends.TrendState's format (days is its
+    # packed ring of daily sums), so the backfill replays responses with the
+    # live code; a frozen copy could write a format the reader no longer knows
+    from trends import rebuild
+    rebuild(conn)
+
+def _add_answer_search(conn):
+    # FTS5 index over answers, kept in sync by triggers; queried by search.py
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS responses_fts_source AS
+        SELECT id, answer, 'u' || user_id AS owner FROM responses
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5(
+            answer, owner,
+            content='responses_fts_source', content_rowid='id',
+            tokenize='porter unicode61'
+        )
+    """)
+    add = "INSERT INTO responses_fts (rowid, answer, owner) VALUES (NEW.id, NEW.answer, 'u' || NEW.user_id);"
+    remove = ("INSERT INTO responses_fts (responses_fts, rowid, answer, owner) "
+              "VALUES ('delete', OLD.id, OLD.answer, 'u' || OLD.user_id);")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS responses_fts_insert AFTER INSERT ON responses BEGIN {add} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS responses_fts_delete AFTER DELETE ON responses BEGIN {remove} END")
+    conn.execute(f"CREATE TRIGGER IF NOT EXISTS responses_fts_update AFTER UPDATE OF answer, user_id ON responses BEGIN {remove} {add} END")
+    conn.execute("INSERT INTO responses_fts (responses_fts) VALUES ('rebuild')")
+
+def _add_bulk_skipped(conn):
+    # Records bulk_score.py skipped as invalid, counted into lines_done as well
+    conn.execute("ALTER TABLE bulk_checkpoints ADD COLUMN lines_skipped INTEGER NOT NULL DEFAULT 0")
+
+def _add_update_counter(conn):
+    # Counts rows rewritten in place (e.g. by rescore.py) per user, for caches
+    # keyed on the newest id and row count. Trigger frozen as shipped.
+    conn.execute("ALTER TABLE user_summary ADD COLUMN updates INTEGER NOT NULL DEFAULT 0")
+    conn.execute("DROP TRIGGER IF EXISTS responses_rollup_update")
+    conn.execute("""
+        CREATE TRIGGER responses_rollup_update
+        AFTER UPDATE OF user_id, sentiment, confidence, created_at ON responses
+        BEGIN
+            UPDATE daily_mood SET n = n - 1, confidence_sum = confidence_sum - COALESCE(OLD.confidence, 0)
+            WHERE user_id = OLD.user_id AND day = date(OLD.created_at, 'unixepoch', 'localtime') AND sentiment = OLD.sentiment;
+            DELETE FROM daily_mood
+            WHERE user_id = OLD.user_id AND day = date(OLD.created_at, 'unixepoch', 'localtime') AND sentiment = OLD.sentiment AND n <= 0;
+            UPDATE user_summary SET
+                total = total - 1,
+                last_checkin = (SELECT MAX(created_at) FROM responses WHERE user_id = OLD.user_id)
+            WHERE user_id = OLD.user_id;
+            INSERT INTO daily_mood (user_id, day, sentiment, n, confidence_sum)
+            VALUES (NEW.user_id, date(NEW.created_at, 'unixepoch', 'localtime'), NEW.sentiment, 1, COALESCE(NEW.confidence, 0))
+            ON CONFLICT(user_id, day, sentiment) DO UPDATE SET
+                n = n + 1, confidence_sum = confidence_sum + excluded.confidence_sum;
+            INSERT INTO user_summary (user_id, total, last_checkin)
+            VALUES (NEW.user_id, 1, NEW.created_at)
+            ON CONFLICT(user_id) DO UPDATE SET
+                total = total + 1, last_checkin = MAX(COALESCE(last_checkin, 0), excluded.last_checkin);
+            UPDATE user_summary SET updates = updates + 1 WHERE user_id IN (OLD.user_id, NEW.user_id);
+        END
+    """)
+
+MIGRATIONS = [
+    (1, "create users and responses", _create_base_tables),
+    (2, "index responses by user and timestamp", _index_user_timestamp),
+    (3, "integer created_at column on responses", _add_created_at),
+    (4, "daily mood and per-user summary rollups", _add_rollups),
+    (5, "bulk scoring checkpoints", _add_bulk_checkpoints),
+    (6, "model_version column on responses", _add_model_version),
+    (7, "per-user streaming trend state", _add_user_trends),
+    (8, "full-text search index over answers", _add_answer_search),
+    (9, "skipped line count on bulk checkpoints", _add_bulk_skipped),
+    (10, "count in-place updates per user", _add_update_counter),
+]
+
+def current_version(conn=None):
+    conn = conn or connect_db()
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+def migrate(path=None):
+    conn = connect_db(path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TEXT
+        )
+    """)
+    applied = []
+    for version, name, apply in MIGRATIONS:
+        with transaction(path) as conn:
+            # Re-checked inside the write lock in case another process migrated first
+            if version <= current_version(conn):
+                continue
+            apply(conn)
+            conn.execute("INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+                         (version, name, datetime.now().isoformat()))
+        applied.append(version)
+    return applied
+
+if __name__ == "__main__":
+    applied = migrate()
+    print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+    print(f"Schema version: {current_version()}")
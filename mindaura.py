@@ -1,19 +1,41 @@
+import os
+import threading
 import customtkinter as ctk
 from tkinter import filedialog
-from transformers import pipeline
 from datetime import datetime
+from batching import MicroBatcher
+from model_loader import FAILED
+from scorers import get_scorer
 
 BOT_NAME = "Mental Health Check-in Bot"
 
-# Load sentiment analysis model
-sentiment_analyzer = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
+# Any name registered in scorers.SCORERS, e.g. "distilbert-int8" on CPU-only hosts
+SCORER_NAME = os.environ.get("MINDAURA_SCORER", "distilbert")
+
+scorer = get_scorer(SCORER_NAME)
+# Sentiment analysis model, loaded on first use or by warm_up()
+sentiment_model = scorer.model
 
 def analyze_sentiment(text):
-    result = sentiment_analyzer(text)[0]
-    return {
-        "label": result['label'],
-        "score": round(result['score'], 2)
-    }
+    return analyze_sentiment_batch([text], batch_size=1)[0]
+
+def analyze_sentiment_batch(texts, batch_size=16):
+    # "emotion" is included when the scorer has an emotion head (e.g. distilbert-emotion)
+    return [{"label": r["label"], "score": round(r["score"], 2), **({"emotion": r["emotion"]} if "emotion" in r else {})}
+            for r in scorer.score_batch(texts, batch_size=batch_size)]
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+def get_sentiment_batcher(max_batch=32, max_wait=0.02):
+    # Shared across sessions so answers submitted close together end up in one
+    # batch; one batcher per (max_batch, max_wait)
+    key = (max_batch, max_wait)
+    with _batchers_lock:
+        if key not in _batchers:
+            _batchers[key] = MicroBatcher(lambda texts: analyze_sentiment_batch(texts, batch_size=max_batch),
+                                          max_batch=max_batch, max_wait=max_wait)
+        return _batchers[key]
 
 def get_questions():
     return [
@@ -53,8 +75,17 @@ class MentalHealthApp:
         self.submit_button = ctk.CTkButton(root, text="Submit", command=self.handle_response)
         self.submit_button.pack(pady=10)
 
+        self.model_status_label = ctk.CTkLabel(root, text=sentiment_model.status_text(), font=ctk.CTkFont(size=12), text_color="gray")
+        self.model_status_label.pack(pady=5)
+        self.update_model_status()
+
         self.start_questionnaire()
 
+    def update_model_status(self):
+        self.model_status_label.configure(text=sentiment_model.status_text())
+        if not sentiment_model.is_ready() and sentiment_model.state != FAILED:
+            self.root.after(250, self.update_model_status)
+
     def start_questionnaire(self):
         self.display_question()
 
@@ -77,7 +108,9 @@ class MentalHealthApp:
         self.display_question()
 
     def end_questionnaire(self):
-        analysis_results = [analyze_sentiment(f"Q: {q}\nA: {a}") for q, a in self.responses]
+        batcher = get_sentiment_batcher()
+        futures = [batcher.submit(f"Q: {q}\nA: {a}") for q, a in self.responses]
+        analysis_results = [f.result() for f in futures]
 
         positive = sum(1 for r in analysis_results if r["label"] == "POSITIVE")
         negative = len(analysis_results) - positive
@@ -86,7 +119,10 @@ class MentalHealthApp:
         for i, ((question, answer), result) in enumerate(zip(self.responses, analysis_results), 1):
             summary += f"Q{i}: {question}\n"
             summary += f"A: {answer}\n"
-            summary += f"   Sentiment: {result['label']} (Confidence: {result['score'] * 100}%)\n\n"
+            summary += f"   Sentiment: {result['label']} (Confidence: {result['score'] * 100}%)\n"
+            if "emotion" in result:
+                summary += f"   Emotion: {result['emotion']}\n"
+            summary += "\n"
 
         if negative > positive:
             summary += "🧠 It seems you're going through a tough time. Don't hesitate to talk to someone you trust or seek professional support."
@@ -129,4 +165,6 @@ class MentalHealthApp:
 if __name__ == "__main__":
     root = ctk.CTk()
     app = MentalHealthApp(root)
+    # Start loading the model once the first window has been drawn
+    root.after(0, sentiment_model.warm_up)
     root.mainloop()
@@ -0,0 +1,63 @@
+import threading
+from metrics import timed
+
+NOT_LOADED = "not_loaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+class LazyModel:
+    # Holds a model that is only built on first use, optionally warmed up
+    # on a background thread so the GUI can come up before torch is imported.
+    def __init__(self, factory, name=None, label="Model"):
+        self.factory = factory
+        self.name = name
+        self.label = label
+        self.state = NOT_LOADED
+        self.error = None
+        self._model = None
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self):
+        if self._model is not None:
+            return self._model
+        with self._lock:
+            if self._model is None:
+                self.state = LOADING
+                try:
+                    with timed(f"model.load.{self.name}"):
+                        self._model = self.factory()
+                except Exception as e:
+                    self.state = FAILED
+                    self.error = e
+                    raise
+                self.state = READY
+                self.error = None
+        return self._model
+
+    def warm_up(self):
+        if self._model is not None or (self._thread and self._thread.is_alive()):
+            return self._thread
+        self.state = LOADING
+        self._thread = threading.Thread(target=self._warm, name=f"warm-{self.name}", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def _warm(self):
+        try:
+            self.get()
+        except Exception:
+            pass  # state/error already record the failure; get() will retry on use
+
+    def is_ready(self):
+        return self.state == READY
+
+    def status_text(self):
+        if self.state == READY:
+            return f"{self.label} ready"
+        if self.state == FAILED:
+            return f"{self.label} failed to load: {self.error}"
+        if self.state == LOADING:
+            return f"Loading {self.label.lower()} in the background..."
+        return f"{self.label} will load on first use"
@@ -0,0 +1,189 @@
+import argparse
+import json
+import mmap
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+import warnings
+import weakref
+from contextlib import contextmanager
+from metrics import timed
+
+# Local cache of transformer models for the scorers, stored as
+#   <MODEL_CACHE>/<model name>/{config.json, tokenizer files, model.safetensors}
+# Weights are opened with a read-only shared mmap and wrapped as tensors in
+# place, so every process using a model (GUI, service, bulk and batch
+# workers) shares one copy in the page cache, and loading skips both the
+# file read and random initialisation. Loading never touches the network;
+# a model missing from the cache is exported once (from the Hugging Face
+# cache or a download) on first use, or ahead of time with:
+#   python model_registry.py export distilbert-base-uncased-finetuned-sst-2-english
+
+MODEL_CACHE = os.environ.get("MINDAURA_MODEL_CACHE", "models")
+WEIGHTS_FILE = "model.safetensors"
+
+TASKS = {
+    "sequence-classification": "AutoModelForSequenceClassification",
+    "base": "AutoModel",
+}
+
+SAFETENSORS_DTYPES = {
+    "F64": "float64", "F32": "float32", "F16": "float16", "BF16": "bfloat16",
+    "I64": "int64", "I32": "int32", "I16": "int16", "I8": "int8", "U8": "uint8", "BOOL": "bool",
+}
+
+def model_dir(name, cache=None):
+    return os.path.join(cache or MODEL_CACHE, re.sub(r"[^A-Za-z0-9_.-]+", "--", name))
+
+def is_cached(name, cache=None):
+    return os.path.exists(os.path.join(model_dir(name, cache), WEIGHTS_FILE))
+
+def _model_class(task):
+    import transformers
+    return getattr(transformers, TASKS[task])
+
+def export(name, task="sequence-classification", cache=None):
+    # One-time copy into the cache; the only step that may need the network
+    from transformers import AutoTokenizer
+    path = model_dir(name, cache)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    AutoTokenizer.from_pretrained(name).save_pretrained(tmp)
+    _model_class(task).from_pretrained(name).save_pretrained(tmp, safe_serialization=True)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+        if not is_cached(name, cache):  # not just another process winning the race
+            raise
+    return path
+
+def open_weights(path):
+    # {tensor name: tensor} backed by a read-only mmap of a .safetensors file.
+    # Layout: 8-byte little-endian header size, JSON header, raw tensor data.
+    import torch
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    header_size = int.from_bytes(mapped[:8], "little")
+    header = json.loads(mapped[8:8 + header_size])
+    header.pop("__metadata__", None)
+    base = 8 + header_size
+    tensors = {}
+    with warnings.catch_warnings():
+        # torch warns that the buffer is read-only; nothing writes to inference weights
+        warnings.simplefilter("ignore", UserWarning)
+        for tensor_name, info in header.items():
+            dtype = getattr(torch, SAFETENSORS_DTYPES[info["dtype"]])
+            start, end = info["data_offsets"]
+            count = (end - start) // torch.empty((), dtype=dtype).element_size()
+            tensor = torch.frombuffer(mapped, dtype=dtype, count=count, offset=base + start) if count else torch.empty(0, dtype=dtype)
+            tensors[tensor_name] = tensor.view(info["shape"])
+    return tensors, mapped
+
+# Open weight mappings by id() of the model using them; the model can't hold
+# its own, since deep-copying it (as quantize_dynamic does) would pickle the mmap
+_mappings = {}
+
+def _keep_mapping(model, mapped):
+    _mappings[id(model)] = mapped
+    weakref.finalize(model, _mappings.pop, id(model), None)
+
+_meta_lock = threading.Lock()
+_meta_local = threading.local()
+_meta_patched = False
+
+def _patch_register_parameter():
+    # Installed once for the process; it only acts in a thread that is inside
+    # _meta_parameters(), so modules built elsewhere meanwhile are untouched
+    global _meta_patched
+    import torch
+    with _meta_lock:
+        if _meta_patched:
+            return
+        original = torch.nn.Module.register_parameter
+
+        def register_parameter(module, name, param):
+            original(module, name, param)
+            if param is not None and getattr(_meta_local, "active", False):
+                module._parameters[name] = torch.nn.Parameter(param.to("meta"), requires_grad=param.requires_grad)
+
+        torch.nn.Module.register_parameter = register_parameter
+        _meta_patched = True
+
+@contextmanager
+def _meta_parameters():
+    # Parameters are created on the meta device (no allocation, no random
+    # init) while buffers such as position ids stay real, as with
+    # accelerate's init_empty_weights()
+    _patch_register_parameter()
+    _meta_local.active = True
+    try:
+        yield
+    finally:
+        _meta_local.active = False
+
+def load(name, task="sequence-classification", cache=None):
+    # (tokenizer, model) in eval mode with mmap-backed weights; offline once cached
+    from transformers import AutoConfig, AutoTokenizer
+    if not is_cached(name, cache):
+        export(name, task, cache)
+    path = model_dir(name, cache)
+    with timed("model_registry.load"):
+        tokenizer = AutoTokenizer.from_pretrained(path, local_files_only=True)
+        config = AutoConfig.from_pretrained(path, local_files_only=True)
+        with _meta_parameters():
+            model = _model_class(task).from_config(config)
+        tensors, mapped = open_weights(os.path.join(path, WEIGHTS_FILE))
+        model.load_state_dict(tensors, strict=False, assign=True)
+        model.tie_weights()  # shared tensors are stored once
+        missing = [n for n, p in model.named_parameters() if p.is_meta]
+        if missing:
+            raise ValueError(f"{path} has no weights for: {', '.join(missing[:5])}")
+        model.eval()
+        _keep_mapping(model, mapped)  # open for the model's lifetime
+    return tokenizer, model
+
+def _rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the local memory-mapped model cache.")
+    parser.add_argument("command", choices=["export", "list", "check"])
+    parser.add_argument("name", nargs="?")
+    parser.add_argument("--task", default="sequence-classification", choices=list(TASKS))
+    parser.add_argument("--cache", default=MODEL_CACHE)
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        if os.path.isdir(args.cache):
+            for entry in sorted(os.listdir(args.cache)):
+                weights = os.path.join(args.cache, entry, WEIGHTS_FILE)
+                if os.path.exists(weights):
+                    print(f"{entry}  {os.path.getsize(weights) / 2**20:.1f} MB")
+        return 0
+    if not args.name:
+        parser.error(f"{args.command} needs a model name")
+    if args.command == "export":
+        print(f"Exported to {export(args.name, args.task, args.cache)}")
+    else:
+        # Load time and resident memory it added; the weight pages count towards
+        # RSS only as they are touched, and are shared with other processes
+        import torch  # imported first so it isn't counted
+        before, started = _rss_mb(), time.perf_counter()
+        load(args.name, args.task, args.cache)
+        print(f"Loaded {args.name} in {(time.perf_counter() - started) * 1000:.0f}ms, "
+              f"RSS +{(_rss_mb() or 0) - (before or 0):.0f} MB")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import importlib
+import os
+import threading
+
+# Heavy modules the GUI defers until a feature is used. After the login screen
+# is drawn they are imported on a background thread, so the first click on
+# quiz, graph or export doesn't pay for them. Set MINDAURA_PREFETCH=0 to skip.
+MODULES = (
+    "numpy",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_tkagg",
+    "fpdf",
+    "timeseries",
+    "graph_viewer",
+    "report_generator",
+    "mental_health_app",
+)
+
+_started = False
+
+def _run(modules):
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass  # the feature will surface the real error when it is used
+    # Loading the scorer's lexicon is the other big first-use cost
+    from mental_health_app import GUI_SCORER
+    from scorers import get_scorer
+    get_scorer(GUI_SCORER).model.warm_up()
+
+def start(modules=MODULES):
+    global _started
+    if _started or os.environ.get("MINDAURA_PREFETCH") == "0":
+        return None
+    _started = True
+    thread = threading.Thread(target=_run, args=(modules,), name="prefetch", daemon=True)
+    thread.start()
+    return thread
@@ -1,39 +1,100 @@
 from fpdf import FPDF
 from db import connect_db
-from datetime import datetime
-import matplotlib.pyplot as plt
+from datetime import datetime, date
+from array import array
+from itertools import chain
+from io import BytesIO
+import os
+import tempfile
+from matplotlib.figure import Figure
+from timeseries import plot_series
+from chart_manager import get_manager
+from metrics import timed
 
-def generate_mood_graph_image(user_id, output_path="mood_chart.png"):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT timestamp, emotion, confidence FROM responses WHERE user_id=? ORDER BY timestamp", (user_id,))
-    data = cursor.fetchall()
-    conn.close()
+FETCH_SIZE = 500
 
-    if not data:
-        return None
+def _epoch(value):
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, date):
+        return int(datetime(value.year, value.month, value.day).timestamp())
+    return value
+
+def iter_responses(user_id, since=None, until=None, max_rows=None):
+    # Yields (question, answer, sentiment, emotion, confidence, timestamp, created_at)
+    # oldest first, FETCH_SIZE rows at a time. since/until are datetimes, dates
+    # or epoch seconds; until is exclusive. max_rows keeps the most recent rows.
+    sql = "SELECT question, answer, sentiment, emotion, confidence, timestamp, created_at, id FROM responses WHERE user_id=?"
+    params = [user_id]
+    if since is not None:
+        sql += " AND created_at >= ?"
+        params.append(_epoch(since))
+    if until is not None:
+        sql += " AND created_at < ?"
+        params.append(_epoch(until))
+    if max_rows is not None:
+        sql = f"SELECT * FROM ({sql} ORDER BY created_at DESC, id DESC LIMIT ?)"
+        params.append(max_rows)
+    sql += " ORDER BY created_at, id"
+
+    cursor = connect_db().execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                return
+            for row in rows:
+                yield row[:7]
+    finally:
+        cursor.close()
+
+@timed("chart.render")
+def render_mood_chart(epochs, confidence):
+    # PNG bytes in memory; Figure is used directly so nothing is left in pyplot's registry
+    fig = Figure(figsize=(6, 3))
+    ax = fig.subplots()
+    plot_series(ax, epochs, confidence, width_inches=6, color='blue', dpi=fig.dpi)
+    ax.set_title("Mood Confidence Over Time")
+    ax.set_ylabel("Confidence (%)")
+    ax.set_ylim(0, 100)
+    fig.tight_layout()
+    buffer = BytesIO()
+    fig.savefig(buffer, format="png")
+    buffer.seek(0)
+    return buffer
 
-    timestamps = [d[0][:16].replace("T", "\n") for d in data]
-    confidence = [d[2] for d in data]
+def generate_mood_graph_image(user_id, output_path=None):
+    # Same chart as the mood history window, rendered at most once per new answer
+    buffer = get_manager().png(user_id, "confidence")
 
-    plt.figure(figsize=(6, 3))
-    plt.plot(timestamps, confidence, marker='o', linestyle='-', color='blue')
-    plt.xticks(rotation=45)
-    plt.title("Mood Confidence Over Time")
-    plt.ylabel("Confidence (%)")
-    plt.tight_layout()
-    plt.savefig(output_path)
-    plt.close()
+    if buffer is None:
+        return None
+
+    if output_path is None:
+        return buffer
+    with open(output_path, "wb") as f:
+        f.write(buffer.getvalue())
     return output_path
 
-def generate_pdf_report(user_id, username, filename="MentalHealth_Report.pdf"):
-    conn = connect_db()
-    cursor = conn.cursor()
-    cursor.execute("SELECT question, answer, sentiment, emotion, confidence, timestamp FROM responses WHERE user_id=? ORDER BY timestamp", (user_id,))
-    records = cursor.fetchall()
-    conn.close()
+def _add_image(pdf, png, **kwargs):
+    try:
+        pdf.image(png, **kwargs)  # fpdf2 reads file-like objects directly
+    except (TypeError, AttributeError):
+        # PyFPDF 1.x only takes paths; use a private temp file so concurrent exports don't collide
+        fd, path = tempfile.mkstemp(suffix=".png")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(png.getvalue())
+            pdf.image(path, **kwargs)
+        finally:
+            os.remove(path)
 
-    if not records:
+@timed("report.pdf")
+def generate_pdf_report(user_id, username, filename="MentalHealth_Report.pdf", since=None, until=None, max_rows=None):
+    records = iter_responses(user_id, since=since, until=until, max_rows=max_rows)
+    first = next(records, None)
+
+    if first is None:
         return None
 
     pdf = FPDF()
@@ -44,7 +105,14 @@ def generate_pdf_report(user_id, username, filename="MentalHealth_Report.pdf"):
     pdf.cell(200, 10, f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M')}", ln=1, align="C")
     pdf.ln(5)
 
-    for i, (q, a, s, e, c, t) in enumerate(records, 1):
+    # Rows are laid out as they stream in. The whole history is charted by the
+    # chart manager's cached PNG; a bounded report collects its own series.
+    # FPDF itself keeps every page in memory until output().
+    whole_history = since is None and until is None and max_rows is None
+    epochs, confidence = array("q"), array("d")
+    i = 0
+    for q, a, s, e, c, t, created_at in chain([first], records):
+        i += 1
         pdf.set_font("Arial", "B", 12)
         pdf.multi_cell(0, 10, f"Q{i}: {q}")
         pdf.set_font("Arial", "", 12)
@@ -52,13 +120,18 @@ def generate_pdf_report(user_id, username, filename="MentalHealth_Report.pdf"):
         pdf.cell(0, 8, f"Sentiment: {s}, Emotion: {e}, Confidence: {c}%", ln=1)
         pdf.cell(0, 8, f"Timestamp: {t}", ln=1)
         pdf.ln(4)
+        if not whole_history:
+            epochs.append(created_at or 0)
+            confidence.append(c or 0.0)
 
-    graph_path = generate_mood_graph_image(user_id)
-    if graph_path:
-        pdf.add_page()
-        pdf.set_font("Arial", "B", 14)
-        pdf.cell(0, 10, "Mood Confidence Trend", ln=1)
-        pdf.image(graph_path, x=10, y=30, w=190)
+    pdf.add_page()
+    pdf.set_font("Arial", "B", 14)
+    pdf.cell(0, 10, "Mood Confidence Trend", ln=1)
+    if whole_history:
+        chart = get_manager().png(user_id, "confidence")
+    else:
+        chart = render_mood_chart(epochs, confidence)
+    _add_image(pdf, chart, x=10, y=30, w=190)
 
     pdf.output(filename)
     return filename
@@ -0,0 +1,86 @@
+import argparse
+import sys
+import threading
+import time
+from db import create_tables, query, transaction
+from scorers import get_scorer, response_fields
+from trends import rescored
+
+# Re-scores stored answers whose model_version differs from the target
+# scorer's tag. Rows are walked by id in small chunks and each chunk is
+# updated in its own short transaction, with a pause in between, so live
+# check-ins can keep writing. Progress is the model_version column itself:
+# an interrupted run simply picks up the rows that are still stale. The
+# chunk's transaction also applies the changed moods to the users' trend
+# state (trends.rescored), so it never lags behind the stored labels.
+
+def stale_count(model_tag):
+    return query("SELECT COUNT(*) FROM responses WHERE model_version IS NOT ?", (model_tag,))[0][0]
+
+def rescore(scorer_name, chunk_size=256, pause=0.05, stop_event=None, progress=None):
+    scorer = get_scorer(scorer_name)
+    tag = scorer.model_tag
+    last_id = 0
+    updated = 0
+    while not (stop_event and stop_event.is_set()):
+        # Read and score outside any write transaction
+        rows = query("""
+            SELECT id, answer, user_id FROM responses
+            WHERE id > ? AND model_version IS NOT ?
+            ORDER BY id LIMIT ?
+        """, (last_id, tag, chunk_size))
+        if not rows:
+            break
+        results = scorer.score_batch([answer or "" for _, answer, _ in rows])
+        fields = {row[0]: response_fields(r) for row, r in zip(rows, results)}
+        with transaction() as conn:
+            # Re-read under the write lock, skipping rows another writer re-scored meanwhile
+            old = [row for row in conn.execute("""
+                SELECT id, user_id, created_at, sentiment, confidence FROM responses
+                WHERE id BETWEEN ? AND ? AND model_version IS NOT ?
+            """, (rows[0][0], rows[-1][0], tag)) if row[0] in fields]
+            conn.executemany("""
+                UPDATE responses SET sentiment = ?, emotion = ?, confidence = ?, model_version = ? WHERE id = ?
+            """, [(fields[row_id]["sentiment"], fields[row_id]["emotion"], fields[row_id]["confidence"], tag, row_id)
+                  for row_id, *_ in old])
+            rescored(conn, [(user_id, created_at, sentiment, confidence,
+                             fields[row_id]["sentiment"], fields[row_id]["confidence"])
+                            for row_id, user_id, created_at, sentiment, confidence in old])
+        last_id = rows[-1][0]
+        updated += len(rows)
+        if progress:
+            progress(updated, last_id)
+        if pause:
+            time.sleep(pause)
+    return updated
+
+def start_background_rescore(scorer_name, **kwargs):
+    # Returns (thread, stop_event); set the event to stop after the current chunk
+    stop_event = threading.Event()
+    thread = threading.Thread(target=rescore, args=(scorer_name,), kwargs={**kwargs, "stop_event": stop_event},
+                              name="rescore", daemon=True)
+    thread.start()
+    return thread, stop_event
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-score stored responses with a different scorer.")
+    parser.add_argument("--scorer", default="lexicon", help="backend registered in scorers.SCORERS")
+    parser.add_argument("--chunk-size", type=int, default=256, help="rows per transaction")
+    parser.add_argument("--pause", type=float, default=0.05, help="seconds to sleep between chunks")
+    args = parser.parse_args(argv)
+    create_tables()
+
+    tag = get_scorer(args.scorer).model_tag
+    total = stale_count(tag)
+    print(f"{total} responses to re-score with {tag}", file=sys.stderr)
+    started = time.monotonic()
+
+    def progress(updated, last_id):
+        rate = updated / (time.monotonic() - started)
+        print(f"{updated}/{total} rows (id {last_id}), {rate:.1f} rows/s", file=sys.stderr)
+
+    updated = rescore(args.scorer, chunk_size=args.chunk_size, pause=args.pause, progress=progress)
+    print(f"Re-scored {updated} responses", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import sys
+from datetime import datetime
+from db import query, query_one, transaction
+
+# Daily per-user counts and confidence sums per sentiment label, plus one
+# summary row per user. Both are maintained by triggers on responses, so
+# reads are O(days) / O(1) instead of scanning a user's full history. The
+# tables and triggers are defined by migrations 4 and 10 in migrations.py.
+# user_summary.updates counts a user's rows rewritten in place, so caches
+# keyed on the newest id and row count (chart_manager) can tell they changed.
+
+_DAY = "date({row}.created_at, 'unixepoch', 'localtime')"
+
+def rebuild(conn=None):
+    if conn is None:
+        with transaction() as conn:
+            return rebuild(conn)
+    conn.execute("DELETE FROM daily_mood")
+    conn.execute(f"""
+        INSERT INTO daily_mood (user_id, day, sentiment, n, confidence_sum)
+        SELECT user_id, {_DAY.format(row="responses")}, sentiment, COUNT(*), SUM(COALESCE(confidence, 0))
+        FROM responses
+        GROUP BY 1, 2, 3
+    """)
+    # Upserted rather than recreated so the updates counters never go back
+    conn.execute("""
+        DELETE FROM user_summary
+        WHERE NOT EXISTS (SELECT 1 FROM responses WHERE responses.user_id = user_summary.user_id)
+    """)
+    conn.execute("""
+        INSERT INTO user_summary (user_id, total, last_checkin)
+        SELECT user_id, COUNT(*), MAX(created_at) FROM responses WHERE true GROUP BY user_id
+        ON CONFLICT(user_id) DO UPDATE SET total = excluded.total, last_checkin = excluded.last_checkin
+    """)
+
+def daily_average(user_id, sentiment):
+    # [(day 'YYYY-MM-DD', average confidence), ...] oldest first
+    return query("""
+        SELECT day, confidence_sum / n FROM daily_mood
+        WHERE user_id = ? AND sentiment = ? AND n > 0
+        ORDER BY day
+    """, (user_id, sentiment))
+
+def daily_counts(user_id):
+    # [(day, sentiment, count, average confidence), ...] oldest first
+    return query("""
+        SELECT day, sentiment, n, confidence_sum / n FROM daily_mood
+        WHERE user_id = ? AND n > 0
+        ORDER BY day, sentiment
+    """, (user_id,))
+
+def user_summary(user_id):
+    row = query_one("SELECT total, last_checkin FROM user_summary WHERE user_id = ?", (user_id,))
+    return row if row else (0, None)
+
+def last_checkin(user_id):
+    # datetime of the user's most recent answer, or None
+    _, epoch = user_summary(user_id)
+    return datetime.fromtimestamp(epoch) if epoch is not None else None
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("usage: python rollups.py rebuild")
+        sys.exit(2)
+    rebuild()
+    print("Rollups rebuilt from responses")
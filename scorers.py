@@ -0,0 +1,348 @@
+import csv
+import hashlib
+import os
+import sys
+import time
+from model_loader import LazyModel
+from chunking import WINDOWING, score_windows
+from sentiment_cache import get_cache
+from metrics import counter, timed
+
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+# Linear emotion head over SENTIMENT_MODEL's encoder; see train_emotion_head()
+EMOTION_HEAD = os.environ.get("MINDAURA_EMOTION_HEAD", "emotion_head.npz")
+
+# Bump when the shape of cached result dicts changes
+RESULT_FORMAT = 2
+# Bump when response_fields() thresholds change so stored rows get re-scored
+FIELDS_VERSION = 1
+
+def polarity_from_label(label, score):
+    return score if label == "POSITIVE" else -score
+
+def label_results(probabilities, id2label):
+    # Class probability rows -> result dicts, taking the most likely label
+    results = []
+    for probs in probabilities:
+        index = max(range(len(probs)), key=probs.__getitem__)
+        label = id2label[index]
+        results.append({"label": label, "score": probs[index], "polarity": polarity_from_label(label, probs[index])})
+    return results
+
+def response_fields(result):
+    # Maps a scorer result onto the sentiment/emotion/confidence columns of responses
+    # Backends with an emotion head supply the emotion; the rest derive it from polarity
+    polarity = result["polarity"]
+    return {
+        "sentiment": result["label"],
+        "emotion": result.get("emotion") or ("Joy" if polarity > 0.3 else "Sadness" if polarity < -0.3 else "Neutral"),
+        "confidence": round(abs(polarity) * 100, 1),
+        "sentiment_score": polarity,
+    }
+
+class Scorer:
+    # Every backend returns one dict per text: label (POSITIVE/NEGATIVE/NEUTRAL),
+    # score (confidence in 0..1) and polarity (signed, -1..1).
+    name = None
+    label = "Model"
+
+    def __init__(self):
+        self.model = LazyModel(self.load_model, name=self.name, label=self.label)
+
+    @property
+    def version(self):
+        raise NotImplementedError
+
+    def load_model(self):
+        raise NotImplementedError
+
+    def score_uncached(self, texts, batch_size=16):
+        raise NotImplementedError
+
+    def score_batch(self, texts, batch_size=16):
+        texts = list(texts)
+        if not texts:
+            return []
+        counter(f"scored.{self.name}").inc(len(texts))
+        with timed(f"score.{self.name}"):
+            return get_cache().get_or_compute_many(
+                texts, self.name, f"{self.version}/r{RESULT_FORMAT}",
+                lambda missing: self._infer(missing, batch_size))
+
+    def _infer(self, texts, batch_size):
+        # Cache misses only; separates model time from cache lookups
+        counter(f"inferred.{self.name}").inc(len(texts))
+        with timed(f"infer.{self.name}"):
+            return self.score_uncached(texts, batch_size=batch_size)
+
+    def score(self, text):
+        return self.score_batch([text], batch_size=1)[0]
+
+    @property
+    def model_tag(self):
+        # Stored in responses.model_version for rows scored by this backend
+        return f"{self.name}:{self.version}/f{FIELDS_VERSION}"
+
+class TextBlobScorer(Scorer):
+    name = "textblob"
+    label = "TextBlob"
+
+    @property
+    def version(self):
+        # textblob doesn't define __version__ in every release
+        from importlib.metadata import version
+        return version("textblob")
+
+    def load_model(self):
+        from textblob import TextBlob
+        return TextBlob
+
+    def score_uncached(self, texts, batch_size=16):
+        TextBlob = self.model.get()
+        results = []
+        for text in texts:
+            polarity = TextBlob(text).sentiment.polarity
+            label = "POSITIVE" if polarity > 0.1 else "NEGATIVE" if polarity < -0.1 else "NEUTRAL"
+            results.append({"label": label, "score": abs(polarity), "polarity": polarity})
+        return results
+
+class LexiconScorer(Scorer):
+    # TextBlob's polarity from a precompiled lexicon table (see lexicon.py),
+    # roughly 7-13x faster; tests/test_lexicon_parity.py compares the two
+    name = "lexicon"
+    label = "Lexicon"
+    chunk_size = 256
+
+    @property
+    def version(self):
+        return f"pattern-{self.model.get().digest}"
+
+    def load_model(self):
+        from lexicon import Lexicon
+        return Lexicon.load()
+
+    def score_uncached(self, texts, batch_size=16):
+        lexicon = self.model.get()
+        results = []
+        for start in range(0, len(texts), self.chunk_size):
+            for polarity in lexicon.polarity_batch(texts[start:start + self.chunk_size]):
+                label = "POSITIVE" if polarity > 0.1 else "NEGATIVE" if polarity < -0.1 else "NEUTRAL"
+                results.append({"label": label, "score": abs(polarity), "polarity": polarity})
+        return results
+
+class PipelineScorer(Scorer):
+    name = "distilbert"
+    label = "Sentiment model"
+
+    @property
+    def version(self):
+        return f"{SENTIMENT_MODEL}/{WINDOWING}"
+
+    def load_model(self):
+        from transformers import pipeline  # deferred: importing torch takes seconds
+        import model_registry
+        tokenizer, model = model_registry.load(SENTIMENT_MODEL)
+        return pipeline("sentiment-analysis", model=model, tokenizer=tokenizer)
+
+    def score_uncached(self, texts, batch_size=16):
+        # Long answers are scored as overlapping windows and batches are
+        # grouped by length (see chunking.py) rather than truncated and
+        # padded in arrival order.
+        import torch
+        pipe = self.model.get()
+        probabilities = score_windows(pipe.tokenizer, lambda encoded: torch.softmax(pipe.model(**encoded).logits, dim=-1),
+                                      texts, batch_size=batch_size, device=pipe.device)
+        return label_results(probabilities, pipe.model.config.id2label)
+
+class QuantizedScorer(Scorer):
+    # Same DistilBERT SST-2 weights with every Linear layer dynamically
+    # quantized to int8; runs on CPU only.
+    name = "distilbert-int8"
+    label = "Sentiment model (int8)"
+
+    @property
+    def version(self):
+        return f"{SENTIMENT_MODEL}+qint8/{WINDOWING}"
+
+    def load_model(self):
+        import torch
+        import model_registry
+        tokenizer, model = model_registry.load(SENTIMENT_MODEL)
+        # The int8 Linear weights are a private copy per process; embeddings and
+        # layer norms stay on the shared mapping, which a deep copy would not keep
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        return tokenizer, model
+
+    def score_uncached(self, texts, batch_size=16):
+        import torch
+        tokenizer, model = self.model.get()
+        probabilities = score_windows(tokenizer, lambda encoded: torch.softmax(model(**encoded).logits, dim=-1),
+                                      texts, batch_size=batch_size)
+        return label_results(probabilities, model.config.id2label)
+
+def load_encoder():
+    import model_registry
+    return model_registry.load(SENTIMENT_MODEL)
+
+def encoder_features(model, encoded):
+    # The [CLS] hidden state that DistilBertForSequenceClassification classifies
+    return model.distilbert(**encoded).last_hidden_state[:, 0]
+
+class MultiHeadScorer(Scorer):
+    # One DistilBERT SST-2 encoder pass per batch feeds two heads: the model's
+    # own sentiment classifier and a linear emotion head trained on the same
+    # [CLS] features, so emotions cost no extra inference.
+    name = "distilbert-emotion"
+    label = "Sentiment + emotion model"
+
+    def __init__(self, head_path=EMOTION_HEAD):
+        self.head_path = head_path
+        self._head_digest = None
+        super().__init__()
+
+    @property
+    def version(self):
+        # Retraining the head changes the version, so cached results and stored rows are refreshed
+        if self._head_digest is None:
+            self._check_head()
+            with open(self.head_path, "rb") as f:
+                self._head_digest = hashlib.sha256(f.read()).hexdigest()[:12]
+        return f"{SENTIMENT_MODEL}+emotion-{self._head_digest}/{WINDOWING}"
+
+    def _check_head(self):
+        if not os.path.exists(self.head_path):
+            raise FileNotFoundError(f"No emotion head at {self.head_path}; "
+                                    f"train one with: python scorers.py train-emotion labelled.csv")
+
+    def load_model(self):
+        import numpy as np
+        import torch
+        self._check_head()
+        head = np.load(self.head_path)
+        tokenizer, model = load_encoder()
+        return tokenizer, model, torch.from_numpy(head["weight"]), torch.from_numpy(head["bias"]), [str(l) for l in head["labels"]]
+
+    def score_uncached(self, texts, batch_size=16):
+        import torch
+        tokenizer, model, weight, bias, emotions = self.model.get()
+        classes = len(model.config.id2label)
+
+        def forward(encoded):
+            # Both heads' probabilities side by side, so windows of long answers average together
+            features = encoder_features(model, encoded)
+            sentiment = torch.softmax(model.classifier(torch.relu(model.pre_classifier(features))), dim=-1)
+            return torch.cat([sentiment, torch.softmax(features @ weight.T + bias, dim=-1)], dim=-1)
+
+        rows = score_windows(tokenizer, forward, texts, batch_size=batch_size)
+        results = label_results([row[:classes] for row in rows], model.config.id2label)
+        for result, row in zip(results, rows):
+            distribution = {name: round(p, 4) for name, p in zip(emotions, row[classes:])}
+            result["emotion"] = max(distribution, key=distribution.get)
+            result["emotions"] = distribution
+        return results
+
+def train_emotion_head(texts, labels, path=EMOTION_HEAD, batch_size=32, l2=1e-4, steps=100):
+    # Fits a multinomial logistic-regression probe on frozen encoder features
+    # and saves it for MultiHeadScorer. Labels are title-cased ("joy" -> "Joy").
+    # Returns training accuracy.
+    import numpy as np
+    import torch
+    names = sorted({label.strip().title() for label in labels})
+    targets = torch.tensor([names.index(label.strip().title()) for label in labels])
+    tokenizer, model = load_encoder()
+    with torch.inference_mode():
+        features = torch.cat([encoder_features(model, tokenizer(texts[i:i + batch_size], padding=True, truncation=True,
+                                                                 return_tensors="pt"))
+                              for i in range(0, len(texts), batch_size)])
+    features = features.clone()
+    head = torch.nn.Linear(features.shape[1], len(names))
+    optimizer = torch.optim.LBFGS(head.parameters(), max_iter=steps, line_search_fn="strong_wolfe")
+
+    def closure():
+        optimizer.zero_grad()
+        loss = torch.nn.functional.cross_entropy(head(features), targets) + l2 * head.weight.pow(2).sum()
+        loss.backward()
+        return loss
+
+    optimizer.step(closure)
+    with torch.no_grad():
+        accuracy = (head(features).argmax(dim=-1) == targets).float().mean().item()
+        np.savez(path, weight=head.weight.numpy().astype(np.float32), bias=head.bias.numpy().astype(np.float32),
+                 labels=np.array(names))
+    return accuracy
+
+SCORERS = {
+    TextBlobScorer.name: TextBlobScorer,
+    LexiconScorer.name: LexiconScorer,
+    PipelineScorer.name: PipelineScorer,
+    QuantizedScorer.name: QuantizedScorer,
+    MultiHeadScorer.name: MultiHeadScorer,
+}
+
+_instances = {}
+
+def get_scorer(name):
+    if name not in SCORERS:
+        raise ValueError(f"Unknown scorer '{name}', expected one of: {', '.join(SCORERS)}")
+    if name not in _instances:
+        _instances[name] = SCORERS[name]()
+    return _instances[name]
+
+SAMPLE_TEXTS = [
+    "I have been feeling pretty good and relaxed this week.",
+    "Honestly I feel overwhelmed by exams and deadlines.",
+    "I can't sleep properly and wake up tired every day.",
+    "I still enjoy playing football with my friends.",
+    "My appetite has been fine, nothing unusual.",
+    "My family is always there for me when I need them.",
+    "I worry about everything and can't calm down.",
+    "It is hard to focus on my studies lately.",
+    "I'm hopeful that things will get better soon.",
+    "Nothing much to add, thanks for asking.",
+]
+
+def check_agreement(texts, reference="distilbert", candidate="distilbert-int8", batch_size=16):
+    # Compares label agreement and confidence drift of a candidate backend
+    # against the reference, bypassing the result cache.
+    ref_scorer, cand_scorer = get_scorer(reference), get_scorer(candidate)
+    ref_scorer.model.get()
+    cand_scorer.model.get()
+
+    start = time.perf_counter()
+    ref = ref_scorer.score_uncached(texts, batch_size=batch_size)
+    ref_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    cand = cand_scorer.score_uncached(texts, batch_size=batch_size)
+    cand_seconds = time.perf_counter() - start
+
+    agree = sum(1 for r, c in zip(ref, cand) if r["label"] == c["label"])
+    drift = [abs(r["polarity"] - c["polarity"]) for r, c in zip(ref, cand)]
+    return {
+        "reference": reference,
+        "candidate": candidate,
+        "texts": len(texts),
+        "label_agreement": agree / len(texts) if texts else 1.0,
+        "mean_polarity_diff": sum(drift) / len(drift) if drift else 0.0,
+        "max_polarity_diff": max(drift, default=0.0),
+        "reference_seconds": ref_seconds,
+        "candidate_seconds": cand_seconds,
+    }
+
+if __name__ == "__main__":
+    # python scorers.py [texts.txt] -- one text per line
+    # python scorers.py train-emotion labelled.csv -- "text,label" rows, e.g. the dair-ai/emotion dataset
+    if sys.argv[1:2] == ["train-emotion"]:
+        with open(sys.argv[2], newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        accuracy = train_emotion_head([r["text"] for r in rows], [r["label"] for r in rows])
+        print(f"Trained emotion head on {len(rows)} examples ({accuracy:.1%} training accuracy), saved to {EMOTION_HEAD}")
+        sys.exit(0)
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            texts = [line.strip() for line in f if line.strip()]
+    else:
+        texts = SAMPLE_TEXTS
+    report = check_agreement(texts)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    sys.exit(0 if report["label_agreement"] >= 0.95 else 1)
@@ -0,0 +1,49 @@
+import re
+import sys
+from db import query
+from metrics import timed
+
+# Full-text search over a user's past answers, backed by the responses_fts
+# FTS5 index (migration 8). The index is external-content: it stores only
+# the inverted index and reads text back from responses through the
+# responses_fts_source view. Every row also carries an "owner" token
+# (u<user_id>), so a search intersects the user's posting list with the
+# terms' instead of filtering every user's matches afterwards.
+
+PAGE_SIZE = 20
+
+def fts_query(text):
+    # Turns free text into a safe MATCH expression: every word must appear,
+    # a trailing * makes it a prefix ("exam*"). Returns None if there are no words.
+    terms = []
+    for word, star in re.findall(r"(\w+)(\*?)", text):
+        terms.append(f'"{word}"{star}')
+    return " ".join(terms) or None
+
+@timed("search")
+def search(user_id, text, page=0, page_size=PAGE_SIZE):
+    # ([{"id", "question", "snippet", "sentiment", "confidence", "timestamp"}], has_more), best match first.
+    # Matched words are wrapped in [brackets] in the snippet.
+    match = fts_query(text)
+    if match is None:
+        return [], False
+    rows = query("""
+        SELECT r.id, r.question, snippet(responses_fts, 0, '[', ']', '...', 16), r.sentiment, r.confidence, r.timestamp
+        FROM responses_fts JOIN responses r ON r.id = responses_fts.rowid
+        WHERE responses_fts MATCH ?
+        ORDER BY bm25(responses_fts, 1.0, 0.0), r.id DESC
+        LIMIT ? OFFSET ?
+    """, (f"owner:u{int(user_id)} AND answer:({match})", page_size + 1, page * page_size))
+    results = [{"id": r[0], "question": r[1], "snippet": r[2], "sentiment": r[3], "confidence": r[4], "timestamp": r[5]}
+               for r in rows[:page_size]]
+    return results, len(rows) > page_size
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python search.py USER_ID WORDS...")
+        sys.exit(2)
+    results, more = search(int(sys.argv[1]), " ".join(sys.argv[2:]))
+    for r in results:
+        print(f"{r['timestamp']}  {r['sentiment']:<8} {r['snippet']}")
+    if more:
+        print("...")
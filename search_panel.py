@@ -0,0 +1,52 @@
+import customtkinter as ctk
+from search import search
+
+class SearchPanel:
+    # Search box over the user's past answers, shown beside the mood history chart
+    def __init__(self, master, user_id):
+        self.user_id = user_id
+        self.text = ""
+        self.page = 0
+
+        self.frame = ctk.CTkFrame(master)
+
+        search_row = ctk.CTkFrame(self.frame, fg_color="transparent")
+        search_row.pack(fill="x", padx=10, pady=(10, 5))
+        self.entry = ctk.CTkEntry(search_row, placeholder_text="Search your answers, e.g. sleep or exam*")
+        self.entry.pack(side="left", fill="x", expand=True)
+        self.entry.bind('<Return>', lambda event: self.run_search())
+        ctk.CTkButton(search_row, text="Search", width=80, command=self.run_search).pack(side="left", padx=(8, 0))
+
+        self.results = ctk.CTkTextbox(self.frame, wrap="word", width=340)
+        self.results.configure(state="disabled")
+        self.results.pack(fill="both", expand=True, padx=10, pady=5)
+
+        self.more_button = ctk.CTkButton(self.frame, text="More results", state="disabled", command=self.next_page)
+        self.more_button.pack(pady=(0, 10))
+
+    def pack(self, **kwargs):
+        self.frame.pack(**kwargs)
+
+    def run_search(self):
+        self.text = self.entry.get().strip()
+        self.page = 0
+        self.results.configure(state="normal")
+        self.results.delete("0.0", "end")
+        self.results.configure(state="disabled")
+        if self.text:
+            self.show_page()
+
+    def next_page(self):
+        self.page += 1
+        self.show_page()
+
+    def show_page(self):
+        results, more = search(self.user_id, self.text, page=self.page)
+        self.results.configure(state="normal")
+        if not results and self.page == 0:
+            self.results.insert("end", f"No answers match \"{self.text}\".")
+        for r in results:
+            when = (r["timestamp"] or "")[:16].replace("T", " ")
+            self.results.insert("end", f"{when}  ·  {r['sentiment']}\n{r['question']}\n{r['snippet']}\n\n")
+        self.results.configure(state="disabled")
+        self.more_button.configure(state="normal" if more else "disabled")
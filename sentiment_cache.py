@@ -0,0 +1,130 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from db import connect_db, transaction
+
+CACHE_DB = "sentiment_cache.db"
+
+# Bump when normalize_text changes, so entries stored under the old keys are never read
+KEY_FORMAT = 2
+
+def normalize_text(text):
+    # Only runs of whitespace are folded; case matters to TextBlob's emoticons (":-D" vs ":-d")
+    return " ".join(text.split())
+
+def cache_key(text, scorer, version):
+    raw = f"{scorer}\x00{version}\x00k{KEY_FORMAT}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class SentimentCache:
+    def __init__(self, path=CACHE_DB, lru_size=4096, max_rows=200_000):
+        self.path = path
+        self.lru_size = lru_size
+        self.max_rows = max_rows
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        with transaction(path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sentiment_cache (
+                    key TEXT PRIMARY KEY,
+                    result TEXT,
+                    last_used INTEGER
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sentiment_cache_last_used ON sentiment_cache(last_used)")
+            self._rows = conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+
+    def _remember(self, key, result):
+        self._lru[key] = result
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _lookup(self, key):
+        result = self._lru.get(key)
+        if result is not None:
+            self._lru.move_to_end(key)
+            self.hits_memory += 1
+            return result
+        conn = connect_db(self.path)
+        row = conn.execute("SELECT result FROM sentiment_cache WHERE key=?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits_disk += 1
+        result = json.loads(row[0])
+        conn.execute("UPDATE sentiment_cache SET last_used=? WHERE key=?", (int(time.time()), key))
+        self._remember(key, result)
+        return result
+
+    def _store(self, items):
+        now = int(time.time())
+        with transaction(self.path) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO sentiment_cache (key, result, last_used) VALUES (?, ?, ?)",
+                [(key, json.dumps(result), now) for key, result in items])
+            self._rows += len(items)
+            if self._rows > self.max_rows:
+                self._evict(conn)
+        for key, result in items:
+            self._remember(key, result)
+
+    def _evict(self, conn):
+        # Drop the least recently used 10% so eviction doesn't run on every insert
+        keep = int(self.max_rows * 0.9)
+        conn.execute("""
+            DELETE FROM sentiment_cache WHERE key IN (
+                SELECT key FROM sentiment_cache ORDER BY last_used LIMIT
+                    (SELECT MAX(COUNT(*) - ?, 0) FROM sentiment_cache)
+            )
+        """, (keep,))
+        self._rows = conn.execute("SELECT COUNT(*) FROM sentiment_cache").fetchone()[0]
+
+    def get(self, text, scorer, version):
+        with self._lock:
+            return self._lookup(cache_key(text, scorer, version))
+
+    def put(self, text, scorer, version, result):
+        with self._lock:
+            self._store([(cache_key(text, scorer, version), result)])
+
+    def get_or_compute(self, text, scorer, version, compute):
+        return self.get_or_compute_many([text], scorer, version, lambda texts: [compute(texts[0])])[0]
+
+    def get_or_compute_many(self, texts, scorer, version, compute_batch):
+        keys = [cache_key(t, scorer, version) for t in texts]
+        with self._lock:
+            results = [self._lookup(k) for k in keys]
+        missing = [i for i, r in enumerate(results) if r is None]
+        if missing:
+            # Score outside the lock; a duplicate computation is cheaper than serializing the model
+            computed = compute_batch([texts[i] for i in missing])
+            for i, result in zip(missing, computed):
+                results[i] = result
+            with self._lock:
+                self._store(list({keys[i]: results[i] for i in missing}.items()))
+        return results
+
+    def stats(self):
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": (self.hits_memory + self.hits_disk) / lookups if lookups else 0.0,
+            "memory_entries": len(self._lru),
+            "disk_entries": self._rows,
+        }
+
+_default_cache = None
+
+def get_cache():
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = SentimentCache()
+    return _default_cache
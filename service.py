@@ -0,0 +1,358 @@
+import argparse
+import asyncio
+import json
+import os
+import secrets
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+import db
+from batching import MicroBatcher
+from metrics import counter, render_prometheus, timed
+from rescore import start_background_rescore
+from scorers import get_scorer, response_fields
+from search import search as search_answers
+
+# Headless HTTP front end for check-ins, for web or mobile clients:
+#   python service.py --port 8080 --scorer distilbert [--rescore]
+# JSON in and out; send "Authorization: Bearer <token>" after logging in.
+#   POST /register  {"username", "password"}
+#   POST /login     {"username", "password"}                    -> {"user_id", "token"}
+#   POST /answers   {"question", "answer"} or {"answers": [...]} -> scored fields
+#   GET  /history?limit=50&before=<cursor>                      -> newest first
+#   GET  /report?days=7                                         -> application/pdf
+#   GET  /search?q=sleep&page=0                                 -> best match first
+#   GET  /metrics                                               -> Prometheus text
+# Answers from every connection are scored together by one MicroBatcher, and
+# all writes go through a single writer task, so SQLite only ever has one
+# writer. Reads run on a small thread pool alongside it (WAL mode). With
+# --rescore, answers stored under another model_version are re-scored with
+# the serving scorer in the background, in short throttled transactions.
+
+SCORER = os.environ.get("MINDAURA_SCORER", "distilbert")
+MAX_BODY = 1 << 20
+MAX_ANSWERS = 100
+MAX_WRITE_BATCH = 256
+HISTORY_LIMIT = 200
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+def _json(status, obj):
+    return status, "application/json", json.dumps(obj).encode("utf-8")
+
+async def read_request(reader):
+    # (method, path, query, headers, body), or None once the client hangs up
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY:
+        raise HTTPError(413, "request body too large")
+    body = await reader.readexactly(length) if length else b""
+    url = urlsplit(target)
+    headers[":version"] = version
+    return method.upper(), url.path, parse_qs(url.query), headers, body
+
+async def send_response(writer, status, content_type, payload, keep_alive):
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + payload)
+    await writer.drain()
+
+def _init_report_thread():
+    import matplotlib
+    matplotlib.use("Agg")
+
+class CheckinService:
+    def __init__(self, scorer_name=SCORER, max_batch=32, max_wait=0.01, readers=4):
+        self.scorer = get_scorer(scorer_name)
+        self.batcher = MicroBatcher(self._score_texts, max_batch=max_batch, max_wait=max_wait)
+        self.sessions = {}
+        self._reads = ThreadPoolExecutor(readers, thread_name_prefix="service-read")
+        # One thread owns the write connection; the writer task feeds it
+        self._write_thread = ThreadPoolExecutor(1, thread_name_prefix="service-write")
+        # matplotlib isn't thread-safe, so reports are rendered one at a time
+        self._reports = ThreadPoolExecutor(1, thread_name_prefix="service-report", initializer=_init_report_thread)
+        self._writes = None
+        self._writer_task = None
+        self._rescore = None  # (thread, stop_event) while re-scoring
+        self.routes = {
+            ("POST", "/register"): self.register,
+            ("POST", "/login"): self.login,
+            ("POST", "/answers"): self.answers,
+            ("GET", "/history"): self.history,
+            ("GET", "/report"): self.report,
+            ("GET", "/search"): self.search,
+            ("GET", "/metrics"): self.metrics,
+        }
+
+    def _score_texts(self, texts):
+        # Runs on the batcher thread with every answer that arrived within max_wait
+        counter("service.score_batches").inc()
+        return [response_fields(r) for r in self.scorer.score_batch(texts, batch_size=len(texts))]
+
+    async def score(self, text):
+        return await asyncio.wrap_future(self.batcher.submit(text))
+
+    async def read(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._reads, fn, *args)
+
+    async def write(self, fn):
+        # fn(conn) runs on the writer thread inside a shared transaction
+        future = asyncio.get_running_loop().create_future()
+        await self._writes.put((fn, future))
+        return await future
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._writes.get()]
+            while len(batch) < MAX_WRITE_BATCH and not self._writes.empty():
+                batch.append(self._writes.get_nowait())
+            try:
+                results = await loop.run_in_executor(self._write_thread, self._apply_writes, [fn for fn, _ in batch])
+            except Exception as e:  # BEGIN/COMMIT itself failed
+                results = [(None, e)] * len(batch)
+            for (_, future), (result, error) in zip(batch, results):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    def _apply_writes(self, fns):
+        # Everything queued commits together; a failing write only rolls back its own savepoint
+        out = []
+        with timed("service.write_batch"), db.transaction() as conn:
+            for fn in fns:
+                conn.execute("SAVEPOINT service_write")
+                try:
+                    out.append((fn(conn), None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO service_write")
+                    out.append((None, e))
+                conn.execute("RELEASE service_write")
+        return out
+
+    def _session(self, headers):
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        session = self.sessions.get(token) if scheme.lower() == "bearer" else None
+        if session is None:
+            raise HTTPError(401, "log in first")
+        return session
+
+    @staticmethod
+    def _credentials(body):
+        data = json.loads(body or b"{}")
+        username, password = data.get("username"), data.get("password")
+        if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+            raise HTTPError(400, "username and password are required")
+        return username, password
+
+    async def register(self, query, headers, body):
+        username, password = self._credentials(body)
+        if not await self.write(lambda conn: db.register_user(username, password)):
+            raise HTTPError(409, "username already exists")
+        return _json(201, {"username": username})
+
+    async def login(self, query, headers, body):
+        username, password = self._credentials(body)
+        user_id = await self.read(db.login_user, username, password)
+        if not user_id:
+            raise HTTPError(401, "incorrect credentials")
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = (user_id, username)
+        return _json(200, {"user_id": user_id, "token": token})
+
+    async def answers(self, query, headers, body):
+        user_id, _ = self._session(headers)
+        data = json.loads(body or b"{}")
+        items = data.get("answers") if "answers" in data else [data]
+        if not isinstance(items, list) or not 0 < len(items) <= MAX_ANSWERS:
+            raise HTTPError(400, f"send between 1 and {MAX_ANSWERS} answers")
+        now = datetime.now().isoformat()
+        rows = []
+        for item in items:
+            question, answer = item.get("question"), item.get("answer")
+            if not isinstance(question, str) or not isinstance(answer, str) or not answer.strip():
+                raise HTTPError(400, "each answer needs a question and a non-empty answer")
+            timestamp = item.get("timestamp") or now
+            try:
+                datetime.fromisoformat(timestamp)
+            except (TypeError, ValueError):
+                raise HTTPError(400, f"bad timestamp: {timestamp!r}")
+            rows.append((question, answer.strip(), timestamp))
+
+        scored = await asyncio.gather(*(self.score(answer) for _, answer, _ in rows))
+        model_version = self.scorer.model_tag
+        await self.write(lambda conn: db.insert_responses(
+            conn, [(user_id, q, a, r["sentiment"], r["emotion"], r["confidence"], t)
+                   for (q, a, t), r in zip(rows, scored)], model_version=model_version))
+        return _json(201, {"results": [{"question": q, **r} for (q, _, _), r in zip(rows, scored)]})
+
+    async def history(self, query, headers, body):
+        # Keyset pagination on (created_at, id), which idx_responses_user_created already orders
+        user_id, _ = self._session(headers)
+        try:
+            limit = min(int(query.get("limit", ["50"])[0]), HISTORY_LIMIT)
+            before = query.get("before", [None])[0]
+            cursor = tuple(int(part) for part in before.split(":")) if before else None
+            if cursor is not None and len(cursor) != 2:
+                raise ValueError(f"cursor {before!r} is not created_at:id")
+        except ValueError:
+            raise HTTPError(400, "bad limit or cursor")
+        sql = "SELECT id, question, answer, sentiment, emotion, confidence, timestamp, created_at FROM responses WHERE user_id = ?"
+        params = [user_id]
+        if cursor:
+            sql += " AND (created_at, id) < (?, ?)"
+            params += cursor
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        rows = await self.read(db.query, sql, (*params, max(limit, 1)))
+        items = [{"id": r[0], "question": r[1], "answer": r[2], "sentiment": r[3], "emotion": r[4],
+                  "confidence": r[5], "timestamp": r[6]} for r in rows]
+        next_cursor = f"{rows[-1][7]}:{rows[-1][0]}" if len(rows) == limit else None
+        return _json(200, {"items": items, "next": next_cursor})
+
+    async def report(self, query, headers, body):
+        user_id, username = self._session(headers)
+        try:
+            days = int(query["days"][0]) if "days" in query else None
+        except ValueError:
+            raise HTTPError(400, "bad days")
+        since = datetime.now() - timedelta(days=days) if days else None
+        pdf = await asyncio.get_running_loop().run_in_executor(self._reports, self._render_report, user_id, username, since)
+        if pdf is None:
+            raise HTTPError(404, "no responses to report")
+        return 200, "application/pdf", pdf
+
+    @staticmethod
+    def _render_report(user_id, username, since):
+        from report_generator import generate_pdf_report
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        os.close(fd)
+        try:
+            if not generate_pdf_report(user_id, username, filename=path, since=since):
+                return None
+            with open(path, "rb") as f:
+                return f.read()
+        finally:
+            os.remove(path)
+
+    async def search(self, query, headers, body):
+        user_id, _ = self._session(headers)
+        try:
+            page = max(int(query.get("page", ["0"])[0]), 0)
+        except ValueError:
+            raise HTTPError(400, "bad page")
+        results, more = await self.read(search_answers, user_id, query.get("q", [""])[0], page)
+        return _json(200, {"items": results, "more": more})
+
+    async def metrics(self, query, headers, body):
+        return 200, "text/plain; version=0.0.4", render_prometheus().encode("utf-8")
+
+    async def dispatch(self, method, path, query, headers, body):
+        handler = self.routes.get((method, path))
+        if handler is None:
+            status = 405 if any(p == path for _, p in self.routes) else 404
+            return _json(status, {"error": STATUS_TEXT[status]})
+        try:
+            with timed(f"service.{path.strip('/')}"):
+                return await handler(query, headers, body)
+        except HTTPError as e:
+            return _json(e.status, {"error": e.message})
+        except (ValueError, AttributeError) as e:  # bad JSON or wrong JSON shape
+            return _json(400, {"error": f"bad request: {e}"})
+        except Exception as e:
+            counter("service.errors").inc()
+            return _json(500, {"error": repr(e)})
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    await send_response(writer, *_json(e.status, {"error": e.message}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, query, headers, body = request
+                status, content_type, payload = await self.dispatch(method, path, query, headers, body)
+                keep_alive = headers[":version"] == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await send_response(writer, status, content_type, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host="127.0.0.1", port=8080, rescore=False):
+        await asyncio.get_running_loop().run_in_executor(self._write_thread, db.create_tables)
+        self._writes = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer())
+        self.scorer.model.warm_up()
+        if rescore:
+            self._rescore = start_background_rescore(self.scorer.name)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    def close(self):
+        if self._writer_task:
+            self._writer_task.cancel()
+        if self._rescore:
+            self._rescore[1].set()  # stops after the current chunk
+        for pool in (self._reads, self._write_thread, self._reports):
+            pool.shutdown(wait=False)
+
+async def serve(host, port, scorer_name, max_batch, max_wait, rescore=False):
+    service = CheckinService(scorer_name, max_batch=max_batch, max_wait=max_wait)
+    server = await service.start(host, port, rescore=rescore)
+    print(f"Serving check-ins on http://{host}:{port} with {scorer_name}", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve check-ins over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--db", default=db.DB_NAME)
+    parser.add_argument("--scorer", default=SCORER)
+    parser.add_argument("--max-batch", type=int, default=32, help="answers scored per model call")
+    parser.add_argument("--max-wait", type=float, default=0.01, help="seconds to wait for a batch to fill")
+    parser.add_argument("--rescore", action="store_true", help="re-score stale stored answers in the background")
+    args = parser.parse_args(argv)
+    db.DB_NAME = args.db
+    try:
+        asyncio.run(serve(args.host, args.port, args.scorer, args.max_batch, args.max_wait, args.rescore))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
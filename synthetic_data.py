@@ -0,0 +1,107 @@
+import argparse
+import random
+import sys
+from datetime import datetime, timedelta
+from db import create_tables, insert_responses, transaction
+from mindaura import get_questions
+
+# Synthetic check-in data for benchmarks and load tests:
+#   python synthetic_data.py --db bench.db --users 100 --responses 100000
+
+OPENERS = ["Honestly,", "I guess", "To be fair,", "Lately", "Most days", "This week", "I think", ""]
+
+PHRASES = {
+    "POSITIVE": [
+        "I have been feeling pretty good and relaxed",
+        "things are going well and I feel calm",
+        "I slept great and woke up rested",
+        "I really enjoyed hanging out with my friends",
+        "my family has been very supportive",
+        "I feel hopeful and excited about the future",
+        "I managed to focus on my studies without much trouble",
+        "my appetite is normal and I am eating well",
+    ],
+    "NEGATIVE": [
+        "I feel overwhelmed by exams and deadlines",
+        "I can't sleep properly and wake up exhausted",
+        "I have lost interest in things I used to love",
+        "I worry about everything and can't calm down",
+        "I feel lonely and nobody really understands me",
+        "it is hard to concentrate on anything",
+        "I have barely been eating and feel drained",
+        "I feel hopeless about what comes next",
+    ],
+    "NEUTRAL": [
+        "nothing much has changed",
+        "it has been an ordinary week",
+        "my routine is about the same as usual",
+        "some days are better than others",
+        "I am not sure how to describe it",
+        "work and classes take most of my time",
+    ],
+}
+
+DETAILS = [
+    "especially in the evenings.", "because of work.", "since the semester started.",
+    "after talking to my roommate.", "when I am alone.", "but I am trying to cope.",
+    "and I don't know why.", "which is new for me.", "most of the time.", "",
+]
+
+def synthetic_answer(rng, label, long=False):
+    parts = [rng.choice(OPENERS), rng.choice(PHRASES[label]), rng.choice(DETAILS)]
+    if long:
+        # Free-text answers to the last question run to several sentences
+        for _ in range(rng.randint(3, 12)):
+            parts += [rng.choice(["Also", "Sometimes", "On top of that", "Then again"]),
+                      rng.choice(PHRASES[rng.choice(list(PHRASES))]), rng.choice(DETAILS)]
+    return " ".join(p for p in parts if p)
+
+def synthetic_rows(rng, user_ids, count, days=365, end=None):
+    # Yields responses rows in the shape db.insert_responses expects
+    questions = get_questions()
+    end = end or datetime.now()
+    start = end - timedelta(days=days)
+    span = (end - start).total_seconds()
+    for _ in range(count):
+        index = rng.randrange(len(questions))
+        label = rng.choices(["POSITIVE", "NEGATIVE", "NEUTRAL"], weights=[4, 3, 3])[0]
+        polarity = {"POSITIVE": rng.uniform(0.1, 1.0), "NEGATIVE": -rng.uniform(0.1, 1.0), "NEUTRAL": rng.uniform(-0.1, 0.1)}[label]
+        emotion = "Joy" if polarity > 0.3 else "Sadness" if polarity < -0.3 else "Neutral"
+        when = start + timedelta(seconds=rng.random() * span)
+        yield (rng.choice(user_ids), questions[index], synthetic_answer(rng, label, long=index == len(questions) - 1),
+               label, emotion, round(abs(polarity) * 100, 1), when.isoformat())
+
+def populate(users=50, responses=20_000, days=365, seed=0, chunk=10_000):
+    # Creates synthetic_user_<n> accounts and inserts responses in chunked transactions.
+    # Returns the user ids.
+    rng = random.Random(seed)
+    create_tables()
+    with transaction() as conn:
+        conn.executemany("INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+                         [(f"synthetic_user_{i}", "synthetic") for i in range(users)])
+        user_ids = [row[0] for row in conn.execute(
+            "SELECT id FROM users WHERE username LIKE 'synthetic_user_%' ORDER BY id LIMIT ?", (users,))]
+    rows = synthetic_rows(rng, user_ids, responses, days=days)
+    inserted = 0
+    while inserted < responses:
+        batch = [row for _, row in zip(range(chunk), rows)]
+        with transaction() as conn:
+            insert_responses(conn, batch, model_version="synthetic")
+        inserted += len(batch)
+    return user_ids
+
+def main(argv=None):
+    import db
+    parser = argparse.ArgumentParser(description="Fill a database with synthetic users and check-in answers.")
+    parser.add_argument("--db", default=db.DB_NAME)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--responses", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    db.DB_NAME = args.db
+    populate(args.users, args.responses, days=args.days, seed=args.seed)
+    print(f"Inserted {args.responses} responses for {args.users} users into {args.db}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
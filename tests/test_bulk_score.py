@@ -0,0 +1,48 @@
+import json
+import pytest
+
+pytest.importorskip("textblob")
+
+import bulk_score
+import db
+from db import query, query_one
+
+LINES = [
+    '{"user_id": 1, "answer": "I feel good today", "timestamp": "2026-01-02T10:00:00"}',
+    '{"user_id": 1, "answer": "bad night',
+    '[1, 2]',
+    '{"user_id": 2, "answer": "fine"}',
+]
+
+@pytest.fixture
+def answers(tmp_path, monkeypatch):
+    # The lexicon table is compiled under the working directory on first use
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / "answers.jsonl"
+    path.write_text("\n".join(LINES) + "\n", encoding="utf-8")
+    return str(path)
+
+def score(*args):
+    return bulk_score.main([*args, "--workers", "1", "--chunk-size", "2", "--no-cache"])
+
+def test_file_job_skips_invalid_lines_and_resumes(answers, tmp_path):
+    output = str(tmp_path / "scored.jsonl")
+    score(answers, "--output", output)
+    with open(output, encoding="utf-8") as f:
+        assert [json.loads(line)["answer"] for line in f] == ["I feel good today", "fine"]
+    with open(output + ".ckpt", encoding="utf-8") as f:
+        state = json.load(f)
+    assert (state["lines_done"], state["lines_skipped"]) == (4, 2)
+
+    score(answers, "--output", output)
+    with open(output, encoding="utf-8") as f:
+        assert len(f.readlines()) == 2
+
+def test_db_job_skips_invalid_lines_and_resumes(answers, tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "test.db"))
+    score(answers, "--to-db")
+    assert query("SELECT user_id, answer FROM responses ORDER BY id") == [(1, "I feel good today"), (2, "fine")]
+    assert query_one("SELECT lines_done, lines_skipped FROM bulk_checkpoints") == (4, 2)
+
+    score(answers, "--to-db")
+    assert query_one("SELECT COUNT(*) FROM responses")[0] == 2
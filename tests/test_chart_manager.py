@@ -0,0 +1,50 @@
+import pytest
+
+pytest.importorskip("matplotlib")
+
+import db
+from chart_manager import ConfidenceChart, DailyPositiveChart
+from db import create_tables, insert_responses, transaction
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "test.db"))
+    create_tables()
+
+def add(*answers):
+    # answers: (user_id, day of January, confidence)
+    with transaction() as conn:
+        insert_responses(conn, [(user, "q", "a", "POSITIVE", "Joy", confidence, f"2026-01-{day:02d}T10:00:00")
+                                for user, day, confidence in answers])
+
+def expected(kind, user_id):
+    chart = (ConfidenceChart if kind == "confidence" else DailyPositiveChart)(user_id)
+    chart.refresh()
+    return [list(part) for part in chart.series()]
+
+@pytest.mark.parametrize("kind", ["confidence", "daily_positive"])
+def test_refresh_follows_inserts_deletes_and_rewrites(database, kind):
+    chart = (ConfidenceChart if kind == "confidence" else DailyPositiveChart)(1)
+    assert not chart.refresh() and chart.empty
+
+    add((1, 1, 50.0), (1, 2, 60.0), (2, 1, 10.0))
+    assert chart.refresh()
+    assert not chart.refresh()
+
+    add((2, 3, 20.0), (1, 3, 70.0))
+    assert chart.refresh()
+    assert [list(part) for part in chart.series()] == expected(kind, 1)
+
+    # A delete and an insert leave the count unchanged
+    with transaction() as conn:
+        conn.execute("DELETE FROM responses WHERE user_id = 1 AND confidence = 60.0")
+    add((1, 4, 80.0))
+    assert chart.refresh()
+    assert [list(part) for part in chart.series()] == expected(kind, 1)
+
+    # Re-scored in place, as rescore.py does
+    with transaction() as conn:
+        conn.execute("UPDATE responses SET confidence = 90.0 WHERE user_id = 1 AND confidence = 50.0")
+    assert chart.refresh()
+    assert [list(part) for part in chart.series()] == expected(kind, 1)
+    assert not chart.refresh()
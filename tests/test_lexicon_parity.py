@@ -0,0 +1,57 @@
+import random
+import pytest
+
+# Parity of the "lexicon" scorer with TextBlob, against a table freshly
+# compiled from the installed textblob, so an upgrade that changes its
+# lexicon or rules shows up here.
+
+pytest.importorskip("textblob")
+
+from lexicon import PARITY_TOLERANCE, Lexicon, compile_table
+from model_loader import LazyModel
+from scorers import SAMPLE_TEXTS, check_agreement, get_scorer
+from synthetic_data import synthetic_answer
+
+# The tokenizer and scoring rules' corner cases
+EDGE_CASES = [
+    "", "   ", "!", "...", "(!)",
+    "not good", "not bad", "never happy", "I don't feel good", "I'm not very happy",
+    "very good", "really not good", "extremely sad!", "good!!!", "bad !", "so good (!)",
+    "I feel great :)", "awful :-(", "ok ;)", "love it <3", "meh :/", "great : )", "xD", "sad :'(",
+    "Mr. Smith was nice.", "e.g. sleep, food etc. are fine.", "I.E. nothing.", "U.S. news is scary...",
+    'He said "I am fine" but he isn\'t.', "It's “fine”, they’re ‘great’.",
+    "Good day.\n\nBad night.", "Good day.\r\n\r\nBad night!", "Happy. Sad. Happy?",
+    "HAPPY", "Not. Good.", "not-good", "hardly happy", "no", "nothing", "fine",
+    "I can't sleep, can't eat, can't focus.", "(happy) [sad] {fine}", "#blessed @friend good~",
+]
+
+def corpus(count=2000, seed=1):
+    rng = random.Random(seed)
+    texts = list(SAMPLE_TEXTS) + EDGE_CASES
+    for _ in range(count):
+        text = synthetic_answer(rng, rng.choice(["POSITIVE", "NEGATIVE", "NEUTRAL"]), long=rng.random() < 0.2)
+        # Mix in the constructs the scoring rules treat specially
+        words = text.split()
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(["not", "very", "never", "!", ":)", ":(", "(!)", "n't"]))
+        texts.append(" ".join(words))
+    return texts
+
+@pytest.fixture
+def lexicon_scorer(tmp_path, monkeypatch):
+    path = compile_table(str(tmp_path / "pattern-en-sentiment.json"))
+    scorer = get_scorer("lexicon")
+    monkeypatch.setattr(scorer, "model", LazyModel(lambda: Lexicon.load(path), name=scorer.name, label=scorer.label))
+    return scorer
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_edge_case_matches_textblob(lexicon_scorer, text):
+    expected, = get_scorer("textblob").score_uncached([text])
+    actual, = lexicon_scorer.score_uncached([text])
+    assert abs(actual["polarity"] - expected["polarity"]) <= PARITY_TOLERANCE
+    assert actual["label"] == expected["label"]
+
+def test_corpus_matches_textblob(lexicon_scorer):
+    report = check_agreement(corpus(), reference="textblob", candidate="lexicon")
+    assert report["max_polarity_diff"] <= PARITY_TOLERANCE
+    assert report["label_agreement"] == 1.0
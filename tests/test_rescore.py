@@ -0,0 +1,46 @@
+import random
+import pytest
+
+pytest.importorskip("textblob")
+
+import db
+import rescore
+import trends
+from db import create_tables, insert_responses, query, transaction
+
+ANSWERS = ["great day", "awful", "fine I guess", "happy happy", "terrible", "not bad", "so sad"]
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "test.db"))
+    create_tables()
+
+def trend_rows():
+    return query("SELECT user_id, n, ewma_sum, ewma_weight, updated_at, negative_streak, last_day, days "
+                 "FROM user_trends ORDER BY user_id")
+
+def test_rescore_keeps_trends_equal_to_a_rebuild(database):
+    rng = random.Random(3)
+    # Several batches so some answers arrive after newer ones
+    for _ in range(4):
+        rows = [(rng.randint(1, 3), "q", rng.choice(ANSWERS), rng.choice(["POSITIVE", "NEGATIVE", "NEUTRAL"]),
+                 "neutral", rng.uniform(50, 100), f"2026-{rng.randint(1, 3):02d}-{rng.randint(1, 28):02d}T{rng.randint(0, 23):02d}:00:00")
+                for _ in range(60)]
+        with transaction() as conn:
+            insert_responses(conn, rows, model_version="old")
+
+    assert rescore.rescore("lexicon", chunk_size=17, pause=0) == 240
+    assert rescore.stale_count(rescore.get_scorer("lexicon").model_tag) == 0
+    incremental = trend_rows()
+    trends.rebuild()
+    rebuilt = trend_rows()
+
+    assert len(incremental) == len(rebuilt) == 3
+    for got, expected in zip(incremental, rebuilt):
+        state, expected_state = trends.TrendState(*got[1:]), trends.TrendState(*expected[1:])
+        assert (got[0], state.n, state.updated_at, state.negative_streak, state.last_day) == \
+               (expected[0], expected_state.n, expected_state.updated_at, expected_state.negative_streak, expected_state.last_day)
+        assert state.ewma_sum == pytest.approx(expected_state.ewma_sum)
+        assert state.ewma_weight == pytest.approx(expected_state.ewma_weight)
+        assert list(state.days) == pytest.approx(list(expected_state.days))
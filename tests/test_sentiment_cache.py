@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip("textblob")
+
+import sentiment_cache
+from scorers import get_scorer
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(sentiment_cache, "_default_cache", sentiment_cache.SentimentCache(str(tmp_path / "cache.db")))
+    return sentiment_cache.get_cache()
+
+def test_keys_keep_case(cache):
+    # TextBlob scores ":-D" higher than ":-d"
+    scorer = get_scorer("textblob")
+    scorer.score("good :-d")
+    assert scorer.score("good :-D") == scorer.score_uncached(["good :-D"])[0]
+    assert cache.stats()["misses"] == 2
+
+def test_keys_fold_whitespace(cache):
+    scorer = get_scorer("textblob")
+    first = scorer.score("not  good\n\ntoday")
+    assert scorer.score("not good today") == first
+    assert cache.stats()["misses"] == 1
@@ -0,0 +1,57 @@
+import asyncio
+import json
+import pytest
+
+pytest.importorskip("textblob")
+
+import db
+import sentiment_cache
+from db import create_tables, insert_responses, transaction
+from rescore import stale_count
+from service import CheckinService, HTTPError
+
+AUTH = {"authorization": "Bearer token"}
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(db, "DB_NAME", str(tmp_path / "test.db"))
+    monkeypatch.setattr(sentiment_cache, "_default_cache", sentiment_cache.SentimentCache(str(tmp_path / "cache.db")))
+    create_tables()
+    with transaction() as conn:
+        insert_responses(conn, [(1, "q", f"answer {i}", "NEUTRAL", "Neutral", 50.0, f"2026-01-{i:02d}T10:00:00")
+                                for i in range(1, 6)])
+    service = CheckinService("lexicon")
+    service.sessions["token"] = (1, "user")
+    return service
+
+def history(service, **query):
+    status, _, body = asyncio.run(service.history({k: [v] for k, v in query.items()}, AUTH, b""))
+    return status, body
+
+def test_history_pages_with_the_cursor(service):
+    status, body = history(service, limit="3")
+    first = json.loads(body)
+    assert status == 200 and len(first["items"]) == 3
+    status, body = history(service, limit="3", before=first["next"])
+    assert [item["answer"] for item in json.loads(body)["items"]] == ["answer 2", "answer 1"]
+
+@pytest.mark.parametrize("before", ["5", "1:2:3", "a:1", ":"])
+def test_history_rejects_malformed_cursors(service, before):
+    with pytest.raises(HTTPError) as error:
+        history(service, before=before)
+    assert error.value.status == 400
+
+def test_start_rescores_stale_answers_in_the_background(service):
+    assert stale_count(service.scorer.model_tag) == 5
+
+    async def run():
+        server = await service.start(port=0, rescore=True)
+        server.close()
+        await server.wait_closed()
+        thread, _ = service._rescore
+        await asyncio.get_running_loop().run_in_executor(None, thread.join, 10)
+        service.close()
+
+    asyncio.run(run())
+    assert stale_count(service.scorer.model_tag) == 0
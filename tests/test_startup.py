@@ -0,0 +1,42 @@
+import os
+import re
+import subprocess
+import sys
+import pytest
+
+# Startup budget of the GUI entry point: main.py is imported in a fresh
+# interpreter under -X importtime; its cumulative import time must stay within
+# the budget and no heavy feature dependency may be imported eagerly.
+
+BUDGET_MS = 400
+DEFERRED = ("matplotlib", "fpdf", "numpy", "textblob", "nltk", "transformers", "torch")
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_profile(module="main"):
+    # {module name: cumulative import time in microseconds}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "MINDAURA_PREFETCH": "0"}
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          capture_output=True, text=True, cwd=root, env=env)
+    assert proc.returncode == 0, f"importing {module} failed:\n{proc.stderr[-2000:]}"
+    imported = {}
+    for match in _LINE.finditer(proc.stderr):
+        self_us, cumulative_us, indent, name = match.groups()
+        imported[name] = int(cumulative_us)
+    return imported
+
+@pytest.fixture(scope="module")
+def main_profile():
+    return import_profile("main")
+
+def test_main_imports_within_budget(main_profile):
+    total_ms = main_profile.get("main", 0) / 1000
+    slowest = sorted(((us, name) for name, us in main_profile.items() if name.count(".") == 0 and name != "main"),
+                     reverse=True)[:5]
+    assert total_ms <= BUDGET_MS, (f"import main took {total_ms:.0f}ms (budget {BUDGET_MS}ms); slowest top-level: "
+                                   + ", ".join(f"{name} {us / 1000:.0f}ms" for us, name in slowest))
+
+def test_main_defers_heavy_dependencies(main_profile):
+    eager = sorted({name.split(".")[0] for name in main_profile} & set(DEFERRED))
+    assert not eager, f"import main eagerly loaded: {', '.join(eager)}"
@@ -0,0 +1,102 @@
+from datetime import datetime
+import numpy as np
+from metrics import timed
+
+# Shared preparation of mood time series for matplotlib: downsample to about
+# as many points as the chart has horizontal pixels, then hand over real
+# datetimes so the axis is time-scaled instead of one label per answer.
+
+DEFAULT_DPI = 100
+
+def point_budget(width_inches, dpi=DEFAULT_DPI, points_per_pixel=1.0):
+    return max(3, int(width_inches * dpi * points_per_pixel))
+
+def lttb(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, per
+    # bucket, the point forming the largest triangle with the previously kept
+    # point and the next bucket's mean. Preserves peaks better than striding.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    # Mean of every bucket up front, vectorized with reduceat
+    sizes = np.diff(edges)
+    mean_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1) / sizes
+    mean_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1) / sizes
+
+    keep = np.empty(n_out, dtype=int)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        if i + 1 < n_out - 2:
+            cx, cy = mean_x[i + 1], mean_y[i + 1]
+        else:
+            cx, cy = x[-1], y[-1]
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+def minmax(x, y, n_out):
+    # Keeps the minimum and maximum of each of n_out // 2 equal-count buckets
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    grid = padded.reshape(buckets, size)
+    valid = ~np.all(np.isnan(grid), axis=1)
+    grid = np.where(np.isnan(grid), np.inf, grid)
+    lows = np.argmin(grid, axis=1)
+    grid = np.where(np.isinf(grid), -np.inf, grid)
+    highs = np.argmax(grid, axis=1)
+    base = np.arange(buckets) * size
+    keep = np.concatenate([(base + lows)[valid], (base + highs)[valid]])
+    return np.unique(keep)
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+def downsample(x, y, n_out, method="lttb"):
+    # Returns (x, y) as arrays reduced to at most n_out points, in order
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = METHODS[method](x, y, n_out)
+    return x[keep], y[keep]
+
+def day_epochs(days):
+    # 'YYYY-MM-DD' strings (as stored in daily_mood) to local-midnight epochs
+    return [datetime.strptime(d, "%Y-%m-%d").timestamp() for d in days]
+
+def prepare_series(epochs, values, max_points, method="lttb"):
+    # Downsampled (datetimes, values) ready for ax.plot
+    x, y = downsample(epochs, values, max_points, method=method)
+    return [datetime.fromtimestamp(t) for t in x], y
+
+def _marker(n):
+    # Markers only help while individual answers are distinguishable
+    return 'o' if n <= 60 else None
+
+@timed("chart.plot")
+def plot_series(ax, epochs, values, width_inches, color, method="lttb", dpi=DEFAULT_DPI):
+    import matplotlib.dates as mdates
+    dates, y = prepare_series(epochs, values, point_budget(width_inches, dpi), method=method)
+    ax.plot(dates, y, marker=_marker(len(y)), linestyle='-', color=color)
+    locator = mdates.AutoDateLocator()
+    ax.xaxis.set_major_locator(locator)
+    ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
+    return len(y)
+
+@timed("chart.plot")
+def set_series(line, epochs, values, width_inches, method="lttb", dpi=DEFAULT_DPI):
+    # Replaces the data of a line drawn by plot_series, keeping the axes as they are
+    dates, y = prepare_series(epochs, values, point_budget(width_inches, dpi), method=method)
+    line.set_data(dates, y)
+    line.set_marker(_marker(len(y)) or 'None')
+    return len(y)
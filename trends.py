@@ -0,0 +1,226 @@
+import math
+import sys
+import time
+from array import array
+from datetime import date, datetime
+from db import query, query_one, transaction
+
+# Streaming per-user mood statistics, folded in as answers are inserted (see
+# db.insert_responses) so trend views and decline flags never scan responses:
+#   - an exponentially weighted mood average with a HALF_LIFE_DAYS half-life
+#   - a ring of WINDOW_DAYS daily (count, mood sum) slots for 7/30-day windows
+#   - the number of consecutive NEGATIVE answers
+# Mood is the signed polarity stored in responses: +confidence/100 for
+# POSITIVE, -confidence/100 for NEGATIVE and 0 otherwise.
+
+HALF_LIFE_DAYS = 7
+WINDOW_DAYS = 30
+
+# Decline flags
+STREAK_ALERT = 5          # consecutive negative answers
+LOW_WEEK_MOOD = -0.2      # 7-day average below this ...
+WEEK_DROP = 0.25          # ... or this far below the 30-day average
+MIN_WEEK_ANSWERS = 3
+
+def mood_value(sentiment, confidence):
+    sign = 1 if sentiment == "POSITIVE" else -1 if sentiment == "NEGATIVE" else 0
+    return sign * (confidence or 0.0) / 100
+
+def local_day(epoch):
+    return datetime.fromtimestamp(epoch).toordinal()
+
+class TrendState:
+    # One user's state; O(1) to update, WINDOW_DAYS slots to read
+    def __init__(self, n=0, ewma_sum=0.0, ewma_weight=0.0, updated_at=None, negative_streak=0, last_day=None, days=None):
+        self.n = n
+        self.ewma_sum = ewma_sum
+        self.ewma_weight = ewma_weight
+        self.updated_at = updated_at
+        self.negative_streak = negative_streak
+        self.last_day = last_day
+        # [count_0, sum_0, count_1, sum_1, ...], slot = day ordinal % WINDOW_DAYS
+        self.days = array("d", bytes(days)) if days else array("d", [0.0] * (2 * WINDOW_DAYS))
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row) if row else cls()
+
+    def to_row(self):
+        return (self.n, self.ewma_sum, self.ewma_weight, self.updated_at, self.negative_streak,
+                self.last_day, self.days.tobytes())
+
+    def add(self, created_at, sentiment, confidence):
+        mood = mood_value(sentiment, confidence)
+        self.n += 1
+        if self.updated_at is None or created_at >= self.updated_at:
+            # Decay what we have to the new answer's time, then add it at full weight
+            decay = self._decay(created_at - self.updated_at) if self.updated_at is not None else 0.0
+            self.ewma_sum = self.ewma_sum * decay + mood
+            self.ewma_weight = self.ewma_weight * decay + 1.0
+            self.updated_at = created_at
+            self.negative_streak = self.negative_streak + 1 if sentiment == "NEGATIVE" else 0
+        else:
+            # Late arrival (e.g. a bulk import): weigh it by its age, streak is unaffected
+            weight = self._decay(self.updated_at - created_at)
+            self.ewma_sum += mood * weight
+            self.ewma_weight += weight
+        self._add_day(local_day(created_at), mood)
+
+    def adjust(self, created_at, delta):
+        # An answer already folded in had its mood changed by delta (re-scoring).
+        # Both the EWMA and the day sums are linear in mood, so no replay is needed.
+        self.ewma_sum += delta * self._decay(max(self.updated_at - created_at, 0))
+        day = local_day(created_at)
+        if self.last_day - WINDOW_DAYS < day <= self.last_day:
+            self.days[2 * (day % WINDOW_DAYS) + 1] += delta
+
+    @staticmethod
+    def _decay(seconds):
+        return math.pow(0.5, seconds / (HALF_LIFE_DAYS * 86400))
+
+    def _add_day(self, day, mood):
+        if self.last_day is None or day > self.last_day:
+            # Clear the slots of the days we skipped over
+            start = day - WINDOW_DAYS + 1 if self.last_day is None else max(self.last_day + 1, day - WINDOW_DAYS + 1)
+            for d in range(start, day + 1):
+                slot = 2 * (d % WINDOW_DAYS)
+                self.days[slot] = self.days[slot + 1] = 0.0
+            self.last_day = day
+        elif day <= self.last_day - WINDOW_DAYS:
+            return  # older than the window
+        slot = 2 * (day % WINDOW_DAYS)
+        self.days[slot] += 1
+        self.days[slot + 1] += mood
+
+    def window(self, days, today=None):
+        # (answers, average mood) over the last `days` local days ending today
+        today = today or date.today().toordinal()
+        count = total = 0.0
+        if self.last_day is not None:
+            for d in range(max(today - days + 1, self.last_day - WINDOW_DAYS + 1), min(today, self.last_day) + 1):
+                slot = 2 * (d % WINDOW_DAYS)
+                count += self.days[slot]
+                total += self.days[slot + 1]
+        return int(count), (total / count if count else None)
+
+    @property
+    def ewma(self):
+        return self.ewma_sum / self.ewma_weight if self.ewma_weight else None
+
+def _load(conn, user_id):
+    return TrendState.from_row(conn.execute(
+        "SELECT n, ewma_sum, ewma_weight, updated_at, negative_streak, last_day, days FROM user_trends WHERE user_id = ?",
+        (user_id,)).fetchone())
+
+def _save(conn, user_id, state):
+    conn.execute("INSERT OR REPLACE INTO user_trends (user_id, n, ewma_sum, ewma_weight, updated_at, negative_streak, last_day, days) "
+                 "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (user_id, *state.to_row()))
+
+def record(conn, rows):
+    # rows: (user_id, sentiment, confidence, created_at), inside the caller's transaction.
+    # One read and one write per user no matter how many rows.
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row[0], []).append(row)
+    for user_id, user_rows in by_user.items():
+        state = _load(conn, user_id)
+        for _, sentiment, confidence, created_at in sorted(user_rows, key=lambda r: r[3]):
+            state.add(created_at, sentiment, confidence)
+        _save(conn, user_id, state)
+
+def _trailing_negatives(conn, user_id):
+    # Length of the user's current run of NEGATIVE answers; reads only that run
+    streak = 0
+    for (sentiment,) in conn.execute(
+            "SELECT sentiment FROM responses WHERE user_id = ? ORDER BY created_at DESC, id DESC", (user_id,)):
+        if sentiment != "NEGATIVE":
+            break
+        streak += 1
+    return streak
+
+def rescored(conn, changes):
+    # changes: (user_id, created_at, old sentiment, old confidence, new sentiment, new confidence)
+    # for rows rewritten in place, inside the caller's transaction after the update.
+    # One read and one write per user; the streak is recounted only when a row
+    # moved into or out of NEGATIVE.
+    by_user = {}
+    for change in changes:
+        by_user.setdefault(change[0], []).append(change)
+    for user_id, user_changes in by_user.items():
+        state = _load(conn, user_id)
+        if not state.n:
+            rebuild(conn, [user_id])
+            continue
+        for _, created_at, old_sentiment, old_confidence, sentiment, confidence in user_changes:
+            state.adjust(created_at, mood_value(sentiment, confidence) - mood_value(old_sentiment, old_confidence))
+        if any((change[2] == "NEGATIVE") != (change[4] == "NEGATIVE") for change in user_changes):
+            state.negative_streak = _trailing_negatives(conn, user_id)
+        _save(conn, user_id, state)
+
+def rebuild(conn=None, user_ids=None):
+    # Replays responses from scratch, e.g. after re-scoring changed stored sentiment
+    if conn is None:
+        with transaction() as conn:
+            return rebuild(conn, user_ids)
+    if user_ids is None:
+        conn.execute("DELETE FROM user_trends")
+        user_ids = [row[0] for row in conn.execute("SELECT DISTINCT user_id FROM responses")]
+    for user_id in user_ids:
+        state = TrendState()
+        for sentiment, confidence, created_at in conn.execute(
+                "SELECT sentiment, confidence, created_at FROM responses WHERE user_id = ? ORDER BY created_at, id", (user_id,)):
+            state.add(created_at, sentiment, confidence)
+        if state.n:
+            _save(conn, user_id, state)
+        else:
+            conn.execute("DELETE FROM user_trends WHERE user_id = ?", (user_id,))
+
+def get_trends(user_id, today=None):
+    # {"total", "ewma", "week": (n, avg), "month": (n, avg), "negative_streak", "flags"}; averages may be None
+    state = TrendState.from_row(query_one(
+        "SELECT n, ewma_sum, ewma_weight, updated_at, negative_streak, last_day, days FROM user_trends WHERE user_id = ?",
+        (user_id,)))
+    trends = {
+        "total": state.n,
+        "ewma": state.ewma,
+        "week": state.window(7, today),
+        "month": state.window(WINDOW_DAYS, today),
+        "negative_streak": state.negative_streak,
+        "updated_at": state.updated_at,
+    }
+    trends["flags"] = decline_flags(trends)
+    return trends
+
+def decline_flags(trends):
+    # Human-readable reasons the user's mood looks to be in sustained decline
+    flags = []
+    if trends["negative_streak"] >= STREAK_ALERT:
+        flags.append(f"{trends['negative_streak']} negative answers in a row")
+    week_n, week_avg = trends["week"]
+    _, month_avg = trends["month"]
+    if week_n >= MIN_WEEK_ANSWERS and week_avg is not None:
+        if week_avg < LOW_WEEK_MOOD:
+            flags.append("mostly negative answers this week")
+        elif month_avg is not None and week_avg < month_avg - WEEK_DROP:
+            flags.append("mood this week is well below your monthly average")
+    return flags
+
+def declining_users(today=None):
+    # [(user_id, flags)] for every user with at least one flag; reads only user_trends
+    users = []
+    for (user_id,) in query("SELECT user_id FROM user_trends WHERE n > 0"):
+        flags = get_trends(user_id, today)["flags"]
+        if flags:
+            users.append((user_id, flags))
+    return users
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        started = time.monotonic()
+        rebuild()
+        print(f"Trends rebuilt from responses in {time.monotonic() - started:.1f}s")
+    elif len(sys.argv) == 3 and sys.argv[1] == "show":
+        print(get_trends(int(sys.argv[2])))
+    else:
+        print("usage: python trends.py rebuild | show USER_ID")
+        sys.exit(2)